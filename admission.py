@@ -0,0 +1,139 @@
+"""Control de admisión de las subidas en la app.
+
+Antes de parsear se verifica lo barato: el tamaño del archivo, las páginas
+(catálogo del PDF o docProps/app.xml del DOCX, sin interpretar el contenido)
+y, en DOCX, el tamaño descomprimido (un zip chico puede expandirse a varios
+GB). Después, ParseGate limita los parseos simultáneos del proceso en orden
+de llegada e informa a cada alumno su lugar en la cola. La subida se vuelca
+a un archivo temporal en bloques y los lectores la reciben como mmap, sin
+copias adicionales en memoria.
+"""
+import mmap
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from contextlib import contextmanager
+
+from correccion import docx_page_count, open_buffer, pdf_page_count
+
+MAX_UPLOAD_MB = 20
+MAX_PAGES = 300
+MAX_DOCX_UNCOMPRESSED_MB = 200
+PARSE_SLOTS = 2
+QUEUE_MAX = 20
+QUEUE_TIMEOUT_S = 300.0
+SPOOL_CHUNK = 1024 * 1024
+
+
+class AdmissionError(Exception):
+    """Entrega rechazada antes de parsear; el mensaje es para el alumno."""
+
+    def __init__(self, message, motivo):
+        super().__init__(message)
+        self.motivo = motivo
+
+
+def check_size(size, max_mb=MAX_UPLOAD_MB):
+    if size > max_mb * 1024 * 1024:
+        raise AdmissionError(f"El archivo pesa {size / 2**20:.1f} MB; el máximo es {max_mb:g} MB.", "tamano")
+
+
+def check_document(data, suffix, max_pages=MAX_PAGES, max_uncompressed_mb=MAX_DOCX_UNCOMPRESSED_MB):
+    """Páginas del documento (o None si no se pueden saber sin parsearlo); AdmissionError si excede."""
+    if suffix == ".docx":
+        try:
+            with zipfile.ZipFile(open_buffer(data)) as zf:
+                expanded = sum(info.file_size for info in zf.infolist())
+        except zipfile.BadZipFile:
+            raise AdmissionError("El archivo .docx está dañado o no es un documento de Word.", "invalido") from None
+        if expanded > max_uncompressed_mb * 1024 * 1024:
+            raise AdmissionError("El documento descomprimido es demasiado grande para corregirlo.", "descomprimido")
+        pages = docx_page_count(data)
+    else:
+        pages = pdf_page_count(data)
+    if pages is not None and pages > max_pages:
+        raise AdmissionError(f"El documento tiene {pages} páginas; el máximo es {max_pages}.", "paginas")
+    return pages
+
+
+@contextmanager
+def spool_upload(uploaded, spool_dir=None):
+    """Vuelca el archivo subido a un temporal, en bloques, y lo entrega como mmap de solo lectura."""
+    with tempfile.TemporaryFile(dir=spool_dir) as fh:
+        uploaded.seek(0)
+        shutil.copyfileobj(uploaded, fh, SPOOL_CHUNK)
+        fh.flush()
+        if fh.tell() == 0:  # mmap no admite archivos vacíos
+            yield b""
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+class ParseGate:
+    """Semáforo FIFO por proceso: como mucho `slots` parseos a la vez, el resto espera en orden."""
+
+    def __init__(self, slots=PARSE_SLOTS, queue_max=QUEUE_MAX, timeout=QUEUE_TIMEOUT_S):
+        self.slots = max(1, slots)
+        self.queue_max = queue_max
+        self.timeout = timeout
+        self.active = 0
+        self._waiting = deque()
+        self._cond = threading.Condition()
+
+    def acquire(self, on_wait=None, poll=0.5):
+        """Espera turno. Mientras tanto llama a `on_wait(lugar)` (1 = el próximo) cada `poll` segundos.
+
+        En Streamlit, `on_wait` actualiza el aviso y además permite cortar la espera
+        si el alumno abandona la página (la excepción de Streamlit saca el turno de la cola).
+        """
+        ticket = object()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if len(self._waiting) >= self.queue_max:
+                raise AdmissionError("Hay demasiadas entregas en espera; reintente en unos minutos.", "cola_llena")
+            self._waiting.append(ticket)
+        try:
+            first = True
+            while True:
+                with self._cond:
+                    if not first:
+                        self._cond.wait(max(0.0, min(poll, deadline - time.monotonic())))
+                    first = False
+                    if self._waiting[0] is ticket and self.active < self.slots:
+                        self._waiting.popleft()
+                        self.active += 1
+                        self._cond.notify_all()
+                        return
+                    if time.monotonic() >= deadline:
+                        raise AdmissionError("La espera para corregir superó el límite; reintente en unos minutos.",
+                                             "espera")
+                    lugar = self._waiting.index(ticket) + 1
+                if on_wait is not None:
+                    on_wait(lugar)
+        except BaseException:
+            with self._cond:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+            raise
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, on_wait=None):
+        self.acquire(on_wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"activos": self.active, "en_espera": len(self._waiting)}
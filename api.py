@@ -0,0 +1,438 @@
+"""API HTTP para que el LMS envíe entregas sin pasar por el formulario.
+
+Uso:
+    python api.py --port 8502 --workers 4 --secrets .streamlit/secrets.toml
+
+Rutas:
+    POST /jobs       multipart/form-data con `archivo`, `email`, `practico` y
+                     opcionalmente `webhook` y `enviar` (0 para no mandar el correo);
+                     o el archivo como cuerpo crudo con los mismos campos en la
+                     query (?filename=tp.pdf&email=...&practico=3).
+                     → 202 {"job_id", "estado", "posicion"}; 200 con el resultado si el
+                     archivo ya estaba corregido; 429 si la cola está llena.
+    GET  /jobs/<id>  → {"job_id", "estado": "en_cola" | "procesando" | "listo", "resultado"}
+    GET  /health     → trabajos en cola y en curso.
+
+La corrección (batch.grade_bytes: los mismos lectores y rúbricas que la app)
+corre en un ProcessPoolExecutor. La cola es acotada: ante un pico de carga se
+responde 429 con Retry-After antes de leer el archivo, en lugar de acumular
+entregas en memoria. Al terminar, el resultado queda disponible para consultar
+durante RESULT_TTL_S, se guarda en el historial (result_store.py), se encola
+el correo al alumno (bandeja de salida, igual que la app) y, si se indicó
+`webhook`, se le hace un POST con el JSON del trabajo. Un archivo idéntico ya
+corregido para el mismo práctico se responde en el acto (200) desde el
+historial. Si se configura API_TOKEN, todas las rutas salvo /health exigen
+`Authorization: Bearer <token>`; con WEBHOOK_SECRET el webhook lleva la firma
+HMAC-SHA256 del cuerpo en `X-Signature-SHA256`. Cada entrega se agrega al
+índice de similitud (near_duplicates.py); las coincidencias se consultan en la
+vista docente y no forman parte de la respuesta ni del correo.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from pathlib import Path
+
+from batch import grade_bytes, init_worker
+from correccion import PRACTICO_LABELS, READERS, RUBRIC_MAX, build_feedback_message
+from parse_cache import content_hash
+
+log = logging.getLogger(__name__)
+
+QUEUE_MAX = 32
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+HEADER_TIMEOUT_S = 15.0
+BODY_TIMEOUT_S = 120.0
+RETRY_AFTER_S = 10
+RESULT_TTL_S = 3600.0
+WEBHOOK_ATTEMPTS = 3
+WEBHOOK_TIMEOUT_S = 10.0
+
+
+class HTTPError(Exception):
+    def __init__(self, status, mensaje, headers=None):
+        super().__init__(mensaje)
+        self.status, self.mensaje, self.headers = status, mensaje, headers or {}
+
+
+class Job:
+    __slots__ = ("id", "filename", "file_bytes", "hash", "email", "practico", "webhook", "enviar",
+                 "estado", "resultado", "creado", "terminado")
+
+    def __init__(self, filename, file_bytes, email, practico, webhook=None, enviar=True):
+        self.id = uuid.uuid4().hex
+        self.filename, self.file_bytes = filename, file_bytes
+        self.hash = None
+        self.email, self.practico = email, practico
+        self.webhook, self.enviar = webhook, enviar
+        self.estado, self.resultado = "en_cola", None
+        self.creado, self.terminado = time.time(), None
+
+    def to_dict(self) -> dict:
+        return {"job_id": self.id, "estado": self.estado, "archivo": self.filename, "email": self.email,
+                "practico": self.practico, "resultado": self.resultado}
+
+
+# ---------------------------------
+# Entrada: formulario multipart o cuerpo crudo
+# ---------------------------------
+def parse_multipart(content_type: str, body: bytes):
+    """Devuelve ({campo: texto}, {campo: (nombre_archivo, bytes)})."""
+    msg = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    if not msg.is_multipart():
+        raise HTTPError(400, "Se esperaba multipart/form-data")
+    fields, files = {}, {}
+    for part in msg.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        data = part.get_payload(decode=True) or b""
+        if part.get_filename():
+            files[name] = (part.get_filename(), data)
+        elif name:
+            fields[name] = data.decode("utf-8", "replace").strip()
+    return fields, files
+
+
+def build_job(query: dict, headers: dict, body: bytes) -> Job:
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        fields, files = parse_multipart(content_type, body)
+        if "archivo" not in files:
+            raise HTTPError(400, "Falta el campo de archivo `archivo`")
+        filename, file_bytes = files["archivo"]
+    else:
+        fields, filename, file_bytes = query, query.get("filename", ""), body
+    fields = {**query, **fields}
+
+    if Path(filename).suffix.lower() not in READERS:
+        raise HTTPError(400, "Formato no soportado. Suba un archivo .docx o .pdf")
+    try:
+        practico = int(fields.get("practico", ""))
+    except ValueError:
+        practico = None
+    if practico not in RUBRIC_MAX:
+        raise HTTPError(400, f"`practico` debe ser uno de {sorted(RUBRIC_MAX)}")
+    enviar = fields.get("enviar", "1").lower() not in ("0", "false", "no")
+    email = fields.get("email", "")
+    if enviar:
+        from email_validator import validate_email, EmailNotValidError
+        try:
+            validate_email(email, check_deliverability=False)
+        except EmailNotValidError:
+            raise HTTPError(400, "Correo electrónico inválido.")
+    webhook = fields.get("webhook") or None
+    if webhook and urllib.parse.urlsplit(webhook).scheme not in ("http", "https"):
+        raise HTTPError(400, "`webhook` debe ser una URL http(s)")
+    return Job(filename, file_bytes, email, practico, webhook, enviar)
+
+
+# ---------------------------------
+# Servicio
+# ---------------------------------
+class GradingService:
+    def __init__(self, workers=None, queue_size=QUEUE_MAX, cache_dir=None, outbox=None,
+                 token=None, webhook_secret=None, max_upload_bytes=MAX_UPLOAD_BYTES, store=None, similarity=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.cache_dir = cache_dir
+        self.outbox = outbox
+        self.store = store
+        self.similarity = similarity
+        self.token = token
+        self.webhook_secret = webhook_secret
+        self.max_upload_bytes = max_upload_bytes
+        self.pool = None
+        self._tasks = set()
+        # Subidas que se están recibiendo: ya ocupan un lugar de la cola aunque no estén en ella.
+        self.receiving = 0
+
+    def _new_pool(self):
+        # "spawn": el proceso principal tiene hilos (bandeja de salida) y fork con hilos no es seguro.
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=init_worker, initargs=(self.cache_dir,))
+
+    def start(self):
+        self.pool = self._new_pool()
+        for _ in range(self.workers):
+            self._spawn(self._dispatch())
+        self._spawn(self._expire())
+        return self
+
+    def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def in_progress(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.estado == "procesando")
+
+    @contextmanager
+    def upload_slot(self):
+        """Reserva un lugar de la cola antes de leer el cuerpo; se libera al encolar o si la lectura falla."""
+        if self.queue.maxsize and self.queue.qsize() + self.receiving >= self.queue.maxsize:
+            raise HTTPError(429, "Demasiadas entregas en cola; reintente más tarde.",
+                            {"Retry-After": str(RETRY_AFTER_S)})
+        self.receiving += 1
+        try:
+            yield
+        finally:
+            self.receiving -= 1
+
+    def submit(self, job: Job) -> int:
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPError(429, "Demasiadas entregas en cola; reintente más tarde.",
+                            {"Retry-After": str(RETRY_AFTER_S)})
+        self.jobs[job.id] = job
+        return self.queue.qsize()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.estado = "procesando"
+            size = len(job.file_bytes)
+            if self.store is not None and job.hash is None:
+                job.hash = await asyncio.to_thread(content_hash, job.file_bytes)
+            pool = self.pool
+            try:
+                resultado = await loop.run_in_executor(pool, grade_bytes, job.file_bytes, job.filename, job.practico,
+                                                       self.similarity is not None, self.store is not None)
+            except BrokenProcessPool:
+                # Un proceso murió (p. ej. sin memoria): se descarta el pool y se arma otro.
+                log.error("El pool de corrección se rompió procesando %s", job.filename)
+                if self.pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = self._new_pool()
+                resultado = {"puntaje": None, "error": "El proceso de corrección terminó inesperadamente"}
+            finally:
+                job.file_bytes = None
+                self.queue.task_done()
+            try:
+                await self._finish(job, resultado, size)
+            except Exception:
+                log.exception("Error al cerrar el trabajo %s", job.id)
+
+    async def reuse_stored(self, job) -> bool:
+        """Si el mismo archivo ya se corrigió (result_store), responde sin pasar por la cola."""
+        if self.store is None:
+            return False
+        job.hash = await asyncio.to_thread(content_hash, job.file_bytes)
+        previo = await asyncio.to_thread(self.store.lookup, job.hash, job.practico)
+        if previo is None:
+            return False
+        resultado = {k: previo[k] for k in ("practico", "puntaje", "maximo", "resumen", "aviso", "sugerido", "puntajes")}
+        resultado.update(error="", segundos=0.0, desglose=[
+            {"criterio": n, "puntaje": got, "maximo": mx, "explicacion": expl} for n, got, mx, expl in previo["desglose"]])
+        size, job.file_bytes = len(job.file_bytes), None
+        self.jobs[job.id] = job
+        await self._finish(job, resultado, size, reutilizado=True)
+        return True
+
+    async def _finish(self, job, resultado, size=None, reutilizado=False):
+        firma, rasgos = resultado.pop("firma", None), resultado.pop("rasgos", None)
+        if not resultado.get("error"):
+            breakdown = [(d["criterio"], d["puntaje"], d["maximo"], d["explicacion"]) for d in resultado["desglose"]]
+            mensaje = build_feedback_message(job.practico, resultado["puntaje"], breakdown,
+                                             resultado["resumen"], resultado["aviso"])
+            resultado["mensaje"] = mensaje
+            if job.enviar and self.outbox is not None:
+                asunto = f"Resultado — {PRACTICO_LABELS[job.practico]}"
+                await asyncio.to_thread(self.outbox.enqueue, job.email, asunto, mensaje)
+            resultado_id = None
+            if self.store is not None:
+                resultado_id = await asyncio.to_thread(
+                    self.store.record, job.hash or "", job.email, job.practico, resultado["puntaje"],
+                    resultado["maximo"], breakdown, resultado["resumen"], resultado["aviso"],
+                    resultado["sugerido"], resultado["puntajes"], {"grade_bytes": resultado["segundos"]},
+                    Path(job.filename).suffix.lstrip(".").lower(), size, None, "api", reutilizado)
+                if rasgos is not None and job.hash:
+                    await asyncio.to_thread(self.store.save_features, job.hash, rasgos["version"],
+                                            rasgos["rasgos"], rasgos["documento"])
+            if self.similarity is not None and job.hash:
+                await asyncio.to_thread(self.similarity.add, job.hash, job.email, job.practico, firma, resultado_id)
+        job.resultado, job.estado, job.terminado = resultado, "listo", time.time()
+        if job.webhook:
+            self._spawn(self._notify(job))
+
+    async def _notify(self, job):
+        body = json.dumps(job.to_dict(), ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.webhook_secret:
+            headers["X-Signature-SHA256"] = hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+
+        def post():
+            req = urllib.request.Request(job.webhook, data=body, headers=headers, method="POST")
+            with urllib.request.urlopen(req, timeout=WEBHOOK_TIMEOUT_S) as resp:
+                return resp.status
+
+        for attempt in range(1, WEBHOOK_ATTEMPTS + 1):
+            try:
+                await asyncio.to_thread(post)
+                return
+            except Exception as e:
+                log.warning("Webhook %s falló (intento %d): %s", job.webhook, attempt, e)
+                await asyncio.sleep(2 ** attempt)
+
+    async def _expire(self):
+        while True:
+            await asyncio.sleep(60)
+            limit = time.time() - RESULT_TTL_S
+            for job_id in [j.id for j in self.jobs.values() if j.terminado and j.terminado < limit]:
+                del self.jobs[job_id]
+
+    # ---- HTTP ----
+    async def handle(self, reader, writer):
+        status, payload, extra = 500, {"error": "Error interno"}, {}
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT_S)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, TimeoutError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            status, payload, extra = await self.route(method, target, headers, reader)
+        except HTTPError as e:
+            status, payload, extra = e.status, {"error": e.mensaje}, e.headers
+        except ValueError:
+            status, payload = 400, {"error": "Pedido HTTP mal formado"}
+        except Exception:
+            log.exception("Error atendiendo un pedido")
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            reason = HTTPStatus(status).phrase
+            head = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json; charset=utf-8",
+                    f"Content-Length: {len(body)}", "Connection: close"]
+            head += [f"{k}: {v}" for k, v in extra.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def _check_token(self, headers):
+        if self.token is None:
+            return
+        given = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(given.encode(), self.token.encode()):
+            raise HTTPError(401, "Token inválido", {"WWW-Authenticate": "Bearer"})
+
+    async def route(self, method, target, headers, reader):
+        url = urllib.parse.urlsplit(target)
+        path = url.path.rstrip("/")
+        if path == "/health" and method == "GET":
+            return 200, {"en_cola": self.queue.qsize(), "recibiendo": self.receiving, "procesando": self.in_progress(),
+                         "capacidad": self.queue.maxsize, "workers": self.workers}, {}
+        self._check_token(headers)
+        if path == "/jobs" and method == "POST":
+            if "content-length" not in headers:
+                raise HTTPError(411, "Falta Content-Length")
+            length = int(headers["content-length"])
+            if length > self.max_upload_bytes:
+                raise HTTPError(413, f"El archivo supera {self.max_upload_bytes // (1024 * 1024)} MB")
+            # Contrapresión antes de leer el archivo: las subidas en curso cuentan como encoladas,
+            # así que en memoria nunca hay más de `queue_size` cuerpos a la vez.
+            with self.upload_slot():
+                try:
+                    body = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT_S)
+                except (asyncio.IncompleteReadError, TimeoutError):
+                    raise HTTPError(400, "Cuerpo incompleto")
+                query = dict(urllib.parse.parse_qsl(url.query))
+                # El multipart de hasta MAX_UPLOAD_BYTES se parsea fuera del event loop.
+                job = await asyncio.to_thread(build_job, query, headers, body)
+                del body
+                if await self.reuse_stored(job):
+                    return 200, job.to_dict(), {"Location": f"/jobs/{job.id}"}
+                posicion = self.submit(job)
+            return 202, {"job_id": job.id, "estado": job.estado, "posicion": posicion}, {"Location": f"/jobs/{job.id}"}
+        if path.startswith("/jobs/") and method == "GET":
+            job = self.jobs.get(path.removeprefix("/jobs/"))
+            if job is None:
+                raise HTTPError(404, "Trabajo inexistente o vencido")
+            return 200, job.to_dict(), {}
+        if path in ("/jobs", "/health") or path.startswith("/jobs/"):
+            raise HTTPError(405, "Método no permitido")
+        raise HTTPError(404, "Ruta inexistente")
+
+
+async def serve(host, port, config, workers=None, queue_size=QUEUE_MAX, cache_dir=None,
+                max_upload_bytes=MAX_UPLOAD_BYTES):
+    outbox = None
+    if config.get("SENDGRID_API_KEY") or config.get("EMAIL_USER"):
+        from outbox import Outbox, Mailer
+        outbox = Outbox(config.get("OUTBOX_DB", "outbox.sqlite3"), Mailer(config)).start()
+    from result_store import ResultStore
+    from near_duplicates import SIMILARITY_MIN, SimilarityIndex
+    db = config.get("RESULTS_DB", "resultados.sqlite3")
+    store = ResultStore(db)
+    similarity = SimilarityIndex(db, float(config.get("SIMILARITY_MIN", SIMILARITY_MIN)))
+    service = GradingService(workers, queue_size, cache_dir, outbox, config.get("API_TOKEN"),
+                             config.get("WEBHOOK_SECRET"), max_upload_bytes, store, similarity).start()
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER_BYTES)
+    log.info("API escuchando en %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+    # SIGTERM/SIGINT cierran en orden: sin esto los procesos del pool quedan huérfanos.
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+        if outbox is not None:
+            outbox.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="API HTTP de corrección para el LMS.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8502)
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos de corrección")
+    ap.add_argument("--queue-size", type=int, default=QUEUE_MAX, help="Entregas en espera antes de responder 429")
+    ap.add_argument("--max-upload-mb", type=int, default=MAX_UPLOAD_BYTES // (1024 * 1024))
+    ap.add_argument("--cache-dir", help="Carpeta para la caché de parseo en disco")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml", help="Configuración (TOML): correo, API_TOKEN")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    config = {}
+    if Path(args.secrets).exists():
+        import tomllib
+        with open(args.secrets, "rb") as fh:
+            config = tomllib.load(fh)
+    asyncio.run(serve(args.host, args.port, config, args.workers, args.queue_size, args.cache_dir,
+                      args.max_upload_mb * 1024 * 1024))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""Corrección por lotes de entregas exportadas del LMS.
+
+Uso:
+    python batch.py entregas.zip --out resultados.csv
+    python batch.py carpeta/ --mapping alumnos.csv --out resultados.json --workers 8
+    python batch.py entregas.zip --enviar --secrets .streamlit/secrets.toml
+
+La entrada es un ZIP o una carpeta con archivos .docx/.pdf y un CSV con las
+columnas `archivo`, `email` y `practico` (si no se indica --mapping se usa el
+único .csv que haya dentro). Cada entrega se parsea y corrige en un proceso
+del pool, porque pdfminer es CPU-bound y de un solo hilo. Con --enviar, los
+resultados se mandan por correo en bloque (ver bulk_mail.py).
+
+Como la app y la API, cada corrección se guarda en el historial (RESULTS_DB,
+origen `batch`) con sus rasgos para regrade.py, y un archivo idéntico ya
+corregido con la misma rúbrica se reutiliza sin parsearlo (--sin-historial
+desactiva ambas cosas).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+from correccion import (READERS, RUBRIC_MAX, PRACTICO_LABELS, read_pdf, extract_features,
+                        evaluar_features, detectar_practico, build_feedback_message, truncation_notice,
+                        features_version)
+from parse_cache import ParseCache, content_hash
+
+RESULT_FIELDS = ["archivo", "email", "practico", "puntaje", "maximo", "desglose", "resumen", "aviso", "sugerido", "error", "segundos", "envio"]
+
+
+# ---------------------------------
+# Entrada: ZIP o carpeta + CSV
+# ---------------------------------
+class SubmissionSource:
+    """Acceso uniforme a los archivos de un ZIP o de una carpeta."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.is_zip = zipfile.is_zipfile(self.path)
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as zf:
+                names = [n for n in zf.namelist() if not n.endswith("/")]
+        else:
+            root = Path(self.path)
+            names = [str(p.relative_to(root)) for p in root.rglob("*") if p.is_file()]
+        # El CSV suele referirse al nombre de archivo sin la ruta dentro del ZIP.
+        self.members = {}
+        for name in names:
+            self.members.setdefault(name, name)
+            self.members.setdefault(Path(name).name, name)
+
+    def resolve(self, archivo):
+        return self.members.get(archivo) or self.members.get(Path(archivo).name)
+
+    def read(self, member) -> bytes:
+        return self.read_member(self.path, member)
+
+    @staticmethod
+    def read_member(path, member) -> bytes:
+        """Lee un archivo sin indexar toda la entrada (lo usan los procesos del pool)."""
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                return zf.read(member)
+        return (Path(path) / member).read_bytes()
+
+    def find_mapping(self):
+        csvs = sorted({m for m in self.members.values() if m.lower().endswith(".csv")})
+        return csvs[0] if len(csvs) == 1 else None
+
+
+def load_mapping(text: str):
+    """Lee el CSV archivo → email → práctico (separador ',' o ';')."""
+    dialect = csv.Sniffer().sniff(text.splitlines()[0], delimiters=",;") if text.strip() else csv.excel
+    rows = []
+    for row in csv.DictReader(io.StringIO(text), dialect=dialect):
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        if row.get("archivo"):
+            rows.append({"archivo": row["archivo"], "email": row.get("email", ""), "practico": row.get("practico", "")})
+    return rows
+
+
+# ---------------------------------
+# Trabajo de cada proceso
+# ---------------------------------
+_worker_cache = None
+_worker_store = None
+
+def init_worker(cache_dir, db_path=None):
+    global _worker_cache, _worker_store
+    if cache_dir:
+        _worker_cache = ParseCache(disk_dir=cache_dir)
+    if db_path:
+        # Solo para consultar correcciones previas; las escrituras las hace el proceso principal.
+        from result_store import ResultStore
+        _worker_store = ResultStore(db_path)
+
+def _empty_result(practico, error=""):
+    return {"practico": practico, "puntaje": None, "maximo": None, "desglose": [], "resumen": "",
+            "aviso": "", "sugerido": None, "puntajes": None, "error": error}
+
+def grade_bytes(file_bytes, filename, practico, firma=False, rasgos=False) -> dict:
+    """Parsea y corrige un archivo ya leído; nunca lanza excepciones (las informa en `error`).
+
+    Lo usan el modo por lotes y la API HTTP (api.py), siempre dentro de un proceso del pool.
+    Con `firma=True` agrega la firma MinHash del texto (near_duplicates.signature), que
+    se calcula aquí para no volver a parsear el documento en el proceso principal.
+    Con `rasgos=True` agrega, con el mismo criterio, lo que result_store.save_features
+    guarda para re-corregir sin parsear: {version, rasgos, documento}.
+    """
+    t0 = time.perf_counter()
+    result = _empty_result(practico)
+    try:
+        num = int(practico)
+        if num not in RUBRIC_MAX:
+            raise ValueError(f"Práctico inexistente: {practico}")
+        suffix = Path(filename).suffix.lower()
+        reader = READERS.get(suffix)
+        if reader is None:
+            raise ValueError(f"Formato no soportado: {suffix}")
+        if reader is read_pdf:
+            # El paralelismo ya lo da el pool: cada PDF se lee en serie.
+            reader = partial(read_pdf, workers=1)
+        if _worker_cache is not None:
+            doc = _worker_cache.get_or_parse(file_bytes, suffix, reader)
+        else:
+            doc = reader(file_bytes)
+        features = extract_features(doc)
+        score, breakdown, summary = evaluar_features(num, features)
+        result["sugerido"], result["puntajes"] = detectar_practico(features, num)
+        result.update(
+            practico=num, puntaje=score, maximo=RUBRIC_MAX[num], resumen=summary, aviso=truncation_notice(doc),
+            desglose=[{"criterio": n, "puntaje": got, "maximo": mx, "explicacion": expl} for n, got, mx, expl in breakdown],
+        )
+        if firma:
+            from near_duplicates import signature
+            result["firma"] = signature(doc)
+        if rasgos:
+            from result_store import pack_document
+            result["rasgos"] = {"version": features_version(), "rasgos": features.to_dict(),
+                                "documento": pack_document(doc)}
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["segundos"] = round(time.perf_counter() - t0, 3)
+    return result
+
+def grade_submission(source_path, member, archivo, email, practico) -> dict:
+    """Lee una entrega de la fuente y la corrige con grade_bytes."""
+    t0 = time.perf_counter()
+    if member is None:
+        result = _empty_result(practico, f"FileNotFoundError: No se encontró el archivo {archivo}")
+    else:
+        try:
+            file_bytes = SubmissionSource.read_member(source_path, member)
+        except Exception as e:
+            result = _empty_result(practico, f"{type(e).__name__}: {e}")
+        else:
+            result = _reuse_or_grade(file_bytes, member, practico)
+    return {"archivo": archivo, "email": email, **result, "segundos": round(time.perf_counter() - t0, 3)}
+
+def _reuse_or_grade(file_bytes, member, practico) -> dict:
+    """Sin historial, grade_bytes. Con historial, reutiliza una corrección idéntica o agrega
+    en `_historial` lo que el proceso principal guarda (hash, tamaño y rasgos)."""
+    if _worker_store is None:
+        return grade_bytes(file_bytes, member, practico)
+    digest = content_hash(file_bytes)
+    historial = {"hash": digest, "tamano": len(file_bytes), "reutilizado": False}
+    previo = _worker_store.lookup(digest, int(practico)) if str(practico).strip().isdigit() else None
+    if previo is not None:
+        result = _empty_result(previo["practico"])
+        result.update({k: previo[k] for k in ("puntaje", "maximo", "resumen", "aviso", "sugerido", "puntajes")})
+        result["desglose"] = [{"criterio": n, "puntaje": got, "maximo": mx, "explicacion": expl}
+                              for n, got, mx, expl in previo["desglose"]]
+        historial["reutilizado"] = True
+    else:
+        result = grade_bytes(file_bytes, member, practico, rasgos=True)
+        historial["rasgos"] = result.pop("rasgos", None)
+    result["_historial"] = historial
+    return result
+
+
+# ---------------------------------
+# Orquestación y salida
+# ---------------------------------
+def record_result(store, result):
+    """Guarda en el historial una corrección sin error (y sus rasgos, si se parseó)."""
+    historial = result.pop("_historial", None)
+    if historial is None or result["error"]:
+        return
+    breakdown = [(d["criterio"], d["puntaje"], d["maximo"], d["explicacion"]) for d in result["desglose"]]
+    store.record(historial["hash"], result["email"], result["practico"], result["puntaje"], result["maximo"],
+                 breakdown, result["resumen"], result["aviso"], result["sugerido"], result["puntajes"],
+                 {"grade_submission": result["segundos"]}, Path(result["archivo"]).suffix.lstrip(".").lower(),
+                 historial["tamano"], None, "batch", historial["reutilizado"])
+    rasgos = historial.get("rasgos")
+    if rasgos is not None:
+        store.save_features(historial["hash"], rasgos["version"], rasgos["rasgos"], rasgos["documento"])
+
+def run_batch(source_path, mapping_rows, workers=None, cache_dir=None, progress=None, db_path=None):
+    """Corrige todas las entregas en un ProcessPoolExecutor; devuelve resultados en el orden del CSV.
+
+    Con `db_path`, cada resultado se guarda en ese historial (result_store) al terminar.
+    """
+    source = SubmissionSource(source_path)
+    results = [None] * len(mapping_rows)
+    store = None
+    if db_path:
+        from result_store import ResultStore
+        store = ResultStore(db_path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cache_dir, db_path)) as pool:
+        futures = {
+            pool.submit(grade_submission, source.path, source.resolve(row["archivo"]),
+                        row["archivo"], row["email"], row["practico"]): i
+            for i, row in enumerate(mapping_rows)
+        }
+        for done, fut in enumerate(as_completed(futures), 1):
+            i = futures[fut]
+            results[i] = fut.result()
+            if store is not None:
+                record_result(store, results[i])
+            else:
+                results[i].pop("_historial", None)
+            if progress:
+                progress(done, len(futures), results[i])
+    return results
+
+
+def write_results(results, out_path):
+    out_path = Path(out_path)
+    if out_path.suffix.lower() == ".json":
+        out_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        return
+    with open(out_path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        for r in results:
+            row = dict(r)
+            row["desglose"] = "; ".join(f"{d['criterio']}: {d['puntaje']}/{d['maximo']}" for d in r["desglose"])
+            writer.writerow({k: row.get(k, "") for k in RESULT_FIELDS})
+
+
+def send_results(results, config, transport=None):
+    """Envía por correo los resultados sin error; anota el estado en `envio`."""
+    from bulk_mail import bulk_send
+    from outbox import Mailer
+
+    to_send = [r for r in results if not r["error"] and r["email"]]
+    items = []
+    for r in to_send:
+        breakdown = [(d["criterio"], d["puntaje"], d["maximo"], d["explicacion"]) for d in r["desglose"]]
+        mensaje = build_feedback_message(r["practico"], r["puntaje"], breakdown, r["resumen"], r["aviso"])
+        items.append((r["email"], f"Resultado — {PRACTICO_LABELS[r['practico']]}", mensaje))
+    mailer = Mailer(config)
+    try:
+        statuses = bulk_send(mailer, items, transport=transport)
+    finally:
+        mailer.close()
+    for r, st in zip(to_send, statuses):
+        r["envio"] = st["via"] or f"fallido: {st['error']}"
+    return statuses
+
+
+def _print_progress(done, total, result):
+    status = result["error"] or f"{result['puntaje']}/{result['maximo']}"
+    print(f"[{done}/{total}] {result['archivo']} — {status}", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Corrección por lotes de prácticos (.docx/.pdf).")
+    ap.add_argument("entrada", help="ZIP o carpeta con las entregas")
+    ap.add_argument("--mapping", help="CSV con columnas archivo,email,practico (por defecto, el .csv de la entrada)")
+    ap.add_argument("--out", default="resultados.csv", help="Archivo de salida (.csv o .json)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos en paralelo")
+    ap.add_argument("--cache-dir", help="Carpeta para la caché de parseo en disco")
+    ap.add_argument("--enviar", action="store_true", help="Enviar los resultados por correo a cada alumno")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml", help="Configuración (TOML): correo, RESULTS_DB")
+    ap.add_argument("--db", help="Historial de correcciones (por defecto RESULTS_DB de la configuración)")
+    ap.add_argument("--sin-historial", action="store_true", help="No guardar ni reutilizar correcciones")
+    args = ap.parse_args(argv)
+
+    config = {}
+    if Path(args.secrets).exists():
+        import tomllib
+        with open(args.secrets, "rb") as fh:
+            config = tomllib.load(fh)
+    db_path = None if args.sin_historial else args.db or config.get("RESULTS_DB", "resultados.sqlite3")
+    if args.enviar and not config:
+        ap.error(f"--enviar requiere la configuración de correo en {args.secrets}")
+
+    source = SubmissionSource(args.entrada)
+    if args.mapping:
+        mapping_text = Path(args.mapping).read_text(encoding="utf-8-sig")
+    else:
+        member = source.find_mapping()
+        if member is None:
+            ap.error("No se indicó --mapping y la entrada no contiene un único .csv")
+        mapping_text = source.read(member).decode("utf-8-sig")
+    rows = load_mapping(mapping_text)
+
+    t0 = time.perf_counter()
+    results = run_batch(args.entrada, rows, workers=args.workers, cache_dir=args.cache_dir, progress=_print_progress,
+                        db_path=db_path)
+    # Primero se guardan las notas: un error al enviar no debe perder la corrección del lote.
+    write_results(results, args.out)
+    if args.enviar:
+        try:
+            statuses = send_results(results, config)
+        finally:
+            # Se reescribe con la columna `envio` (vacía si el envío se interrumpió).
+            write_results(results, args.out)
+        failed = sum(1 for st in statuses if st["via"] is None)
+        print(f"Correos: {len(statuses) - failed} enviados, {failed} fallidos", file=sys.stderr)
+    errors = sum(1 for r in results if r["error"])
+    print(f"{len(results)} entregas en {time.perf_counter() - t0:.1f}s ({errors} con error) → {args.out}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
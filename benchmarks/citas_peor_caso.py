@@ -0,0 +1,220 @@
+"""Peor caso y fuzzing del escáner de citas (citation_scanner.py).
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/citas_peor_caso.py [--chars 200000] [--fuzz 300] [--correctitud 200]
+
+Cada caso patológico se escanea con N y 4·N caracteres: si el tiempo crece
+más de MAX_RATIO veces (lineal sería 4) o supera MAX_US_POR_CHAR, hay
+retroceso superlineal y se sale con código 1. El fuzzing arma documentos
+aleatorios con fragmentos de citas y referencias (paréntesis sin cerrar,
+listas de autores, años, DOIs) y verifica que el escáner no falle y que
+ninguno tarde más que el tope por carácter.
+
+Además, como la velocidad no sirve si el resultado es otro, se generan
+documentos con citas (parentéticas, narrativas, con «et al.», varias en un
+paréntesis) y una lista de referencias conocidas, y se compara lo extraído
+(citas, referencias y el cruce entre ambas) con lo esperado.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from citation_scanner import scan  # noqa: E402
+
+MAX_RATIO = 6.0
+MAX_US_POR_CHAR = 5.0
+
+
+def _texto(unidad):
+    return lambda n: [unidad * (n // len(unidad))]
+
+
+def _lista(entrada, titulo="Referencias"):
+    return lambda n: ["Introducción (García, 2019).", titulo] + [entrada] * (n // len(entrada))
+
+
+CASES = {
+    "paréntesis abiertos": _texto("("),
+    "paréntesis sin cerrar": _texto("(García, "),
+    "minúsculas en paréntesis": _texto("(" + "a, " * 99 + ")"),
+    "mayúsculas": _texto("A"),
+    "mayúsculas con comas": _texto("A, "),
+    "et al. sin año": _texto("García et al "),
+    "partículas": _texto("de la "),
+    "años sueltos": _texto("(2019)"),
+    "narrativa sin año": _texto("García y Pérez ("),
+    "años tras mayúsculas": _texto("A, B y C " * 10 + "(2019) "),
+    "autores sin paréntesis": _texto("García, Pérez, López, & "),
+    "espacios y paréntesis": _texto(" " * 50 + "("),
+    "DOI sin fin": _texto("10.1000/" + "x" * 40),
+    "entrada enorme": lambda n: ["Referencias", "García, J. " * (n // 11)],
+    "lista larga": _lista("García, J., & Pérez, A. (2019). Título del artículo. Revista, 12(3), 45-60. "
+                          "https://doi.org/10.1000/xyz"),
+    "lista sin años": _lista("García, J., Pérez, A., López, M. Título sin año"),
+    "lista con partículas": _lista("de la de la Fuente, M., van der Berg, A. (sin año "),
+    "renglones cortos": lambda n: ["(García,", "2019)", "Pérez", "(2020)"] * (n // 24),
+}
+
+FRAGMENTOS = ["(", ")", "(", ")", "García", "Pérez", "de la Fuente", "OMS", ", ", "; ", " ", " ", "et al.",
+              " & ", " y ", "2019", "2020a", "s.f.", "p. 12", "\n", "A", "J.", ". ", "Referencias\n",
+              "10.1000/abc", "https://doi.org/", "Anexo\n", "Bibliografía\n", "Título", "12(3)"]
+
+
+APELLIDOS = ["García", "Pérez", "López", "Martínez-Ruiz", "Fernández", "Sosa", "Quiroga", "Benítez",
+             "de la Fuente", "Ibáñez", "Olmedo", "Ríos", "Hernández", "Zapata", "Acosta", "Villalba"]
+RELLENO = ["Los resultados muestran una tendencia sostenida en el tiempo",
+           "El muestreo fue intencional (n = 45) y por conveniencia",
+           "La escala tuvo una consistencia interna aceptable (ver tabla 3)",
+           "Se entrevistó a docentes y estudiantes de tres cohortes",
+           "Los datos se analizaron con estadística descriptiva (p. 12)"]
+TITULOS = ["Métodos de investigación social", "Muestreo en estudios educativos",
+           "Validez de instrumentos", "Análisis de datos cualitativos"]
+
+
+def _fuente(rng, anio):
+    autores = rng.sample(APELLIDOS, rng.choice((1, 1, 2, 3)))
+    return autores, str(anio)
+
+
+def _cita(autores, anio, narrativa):
+    """(texto, (autores, año) esperado) de una cita con el formato APA."""
+    if len(autores) >= 3:
+        nombre = f"{autores[0]} et al."
+    elif len(autores) == 2:
+        nombre = f"{autores[0]} {'y' if narrativa else '&'} {autores[1]}"
+    else:
+        nombre = autores[0]
+    return (f"{nombre} ({anio})" if narrativa else f"{nombre}, {anio}"), (nombre, anio)
+
+
+def _referencia(rng, autores, anio):
+    """(párrafo, (autores, año, título?, doi, url) esperado) de una entrada de la lista."""
+    nombres = [f"{a}, {rng.choice('ABCJLMPR')}." for a in autores]
+    lista = nombres[0] if len(nombres) == 1 else ", ".join(nombres[:-1]) + ", & " + nombres[-1]
+    doi = f"10.{rng.randint(1000, 9999)}/rev.{rng.randint(1, 999)}" if rng.random() < 0.6 else ""
+    url = f"https://doi.org/{doi}" if doi else ""
+    texto = f"{lista} ({anio}). {rng.choice(TITULOS)}. Revista de Metodología, 12(3), 45-60."
+    return (f"{texto} {url}" if url else texto), (lista.rstrip("."), anio, True, doi, url)
+
+
+def documento_conocido(rng, fuentes=20):
+    """Párrafos con citas y referencias generadas, y lo que el escáner debería extraer.
+
+    Cada fuente tiene un año distinto, así el cruce esperado no depende de
+    coincidencias de apellidos. Algunas fuentes se citan sin referencia y otras
+    figuran en la lista sin citarse.
+    """
+    anios = rng.sample(range(1980, 2026), fuentes)
+    fuentes = [_fuente(rng, anio) for anio in anios]
+    citadas = [f for f in fuentes if rng.random() < 0.85]
+    en_lista = [f for f in fuentes if rng.random() < 0.85]
+
+    cuerpo, citas, sin_referencia = [], [], []
+    pendientes = list(citadas)
+    rng.shuffle(pendientes)
+    while pendientes:
+        oracion = rng.choice(RELLENO)
+        if rng.random() < 0.4:
+            grupo = [pendientes.pop()]
+            texto, esperada = _cita(*grupo[0], narrativa=True)
+            cuerpo.append(f"{oracion}. {texto} lo confirma.")
+            esperadas = [esperada]
+        else:
+            grupo = [pendientes.pop() for _ in range(min(len(pendientes), rng.randint(1, 3)))]
+            textos, esperadas = zip(*(_cita(*f, narrativa=False) for f in grupo))
+            cuerpo.append(f"{oracion} ({'; '.join(textos)}).")
+        citas.extend(esperadas)
+        sin_referencia.extend(f"{a}, {y}" for f, (a, y) in zip(grupo, esperadas) if f not in en_lista)
+
+    entradas = [_referencia(rng, *f) for f in en_lista]
+    no_citadas = [f"{r[0]}, {r[1]}" for f, (_, r) in zip(en_lista, entradas) if f not in citadas]
+    paragraphs = ["Introducción", *cuerpo, "Referencias", *(texto for texto, _ in entradas)]
+    esperado = {"citas": citas, "referencias": [r for _, r in entradas],
+                "sin_referencia": sin_referencia, "no_citadas": no_citadas, "seccion": True}
+    return paragraphs, esperado
+
+
+def run_correctness(iterations, seed=0):
+    """Compara lo extraído de documentos generados con lo esperado."""
+    rng = random.Random(seed)
+    fallas = []
+    for i in range(iterations):
+        paragraphs, esperado = documento_conocido(rng, rng.randint(1, 30))
+        obtenido = scan(paragraphs).to_dict()
+        for campo, valor in esperado.items():
+            if obtenido[campo] != valor:
+                if isinstance(valor, list):
+                    n = next((k for k, (e, o) in enumerate(zip(valor, obtenido[campo])) if e != o),
+                             min(len(valor), len(obtenido[campo])))
+                    valor, obtenido[campo] = valor[n:n + 1], obtenido[campo][n:n + 1]
+                fallas.append(f"correctitud {i}: {campo}: se esperaba {valor!r}, se obtuvo {obtenido[campo]!r}")
+                break
+    print(f"correctitud: {iterations} documentos generados, {len(fallas)} con diferencias")
+    return fallas
+
+
+def timed(paragraphs, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        scan(paragraphs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def chars(paragraphs):
+    return sum(map(len, paragraphs)) or 1
+
+
+def run_cases(n):
+    fallas = []
+    for name, build in CASES.items():
+        small, large = build(n), build(4 * n)
+        t_small, t_large = timed(small), timed(large)
+        ratio = t_large / max(t_small, 1e-6)
+        us = t_large / chars(large) * 1e6
+        ok = ratio <= MAX_RATIO and us <= MAX_US_POR_CHAR
+        print(f"{'ok ' if ok else 'MAL'} {name:<24} {t_small * 1000:8.1f} ms → {t_large * 1000:8.1f} ms "
+              f"(x{ratio:4.1f}, {us:5.2f} µs/carácter)")
+        if not ok:
+            fallas.append(name)
+    return fallas
+
+
+def run_fuzz(iterations, n, seed=0):
+    rng = random.Random(seed)
+    fallas = []
+    for i in range(iterations):
+        texto = "".join(rng.choice(FRAGMENTOS) for _ in range(rng.randint(1, n // 4)))
+        paragraphs = texto.split("\n")
+        try:
+            t = timed(paragraphs, repeat=1)
+        except Exception as e:  # el escáner no debe fallar con ninguna entrada
+            fallas.append(f"fuzz {i}: {type(e).__name__}: {e}")
+            continue
+        if t / chars(paragraphs) * 1e6 > MAX_US_POR_CHAR and t > 0.01:
+            fallas.append(f"fuzz {i}: {t * 1000:.1f} ms para {chars(paragraphs)} caracteres")
+    print(f"fuzz: {iterations} documentos, {len(fallas)} fallas")
+    return fallas
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Peor caso del escáner de citas.")
+    ap.add_argument("--chars", type=int, default=200_000, help="Tamaño base de cada caso (se prueba también 4x)")
+    ap.add_argument("--fuzz", type=int, default=300, help="Documentos aleatorios")
+    ap.add_argument("--correctitud", type=int, default=200, help="Documentos generados con resultado conocido")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    fallas = (run_correctness(args.correctitud, args.seed) + run_cases(args.chars)
+              + run_fuzz(args.fuzz, args.chars // 10, args.seed))
+    for f in fallas:
+        print(f"FALLA {f}", file=sys.stderr)
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Generador de entregas sintéticas (.docx y .pdf) para los benchmarks.
+
+Cada documento sigue la estructura de un práctico (títulos, citas APA, tablas
+y las palabras que buscan las rúbricas) y se rellena hasta la cantidad de
+páginas pedida. Los PDF se escriben a mano (texto Helvetica, sin dependencias
+extra) para que pdfminer tenga que hacer su trabajo de layout habitual.
+"""
+import io
+import random
+
+from docx import Document
+
+PALABRAS_POR_PAGINA = 450
+LINEAS_POR_PAGINA = 48
+CARACTERES_POR_LINEA = 90
+
+AUTORES = ["García", "Pérez", "Hernández", "Sampieri", "Creswell", "Martínez", "López", "Fernández"]
+
+RELLENO = [
+    "Los resultados obtenidos se discuten a la luz de los antecedentes revisados",
+    "la bibliografía consultada sugiere que el fenómeno presenta múltiples dimensiones",
+    "en este apartado se describen los procedimientos seguidos durante el trabajo de campo",
+    "los participantes fueron informados sobre los objetivos del estudio",
+    "se consideraron las particularidades del contexto institucional",
+    "esta decisión metodológica responde a la naturaleza del problema planteado",
+]
+
+# (nivel de título, título, párrafos) por práctico. Nivel 0 = párrafo sin título.
+SECCIONES = {
+    1: [
+        (1, "Tema", ["El tema de investigación aborda el uso de inteligencia artificial en la escritura académica."]),
+        (1, "Título", ["Título: La IA como apoyo en la redacción de proyectos de investigación."]),
+        (2, "Paradigma", ["Se adopta un paradigma interpretativo con enfoque cualitativo."]),
+        (2, "Pregunta de investigación", ["¿Cómo utilizan los estudiantes herramientas de IA al escribir su proyecto?"]),
+        (2, "Objetivos", ["Objetivo general: comprender las prácticas de escritura mediadas por IA.",
+                          "Objetivos específicos: describir usos, identificar dificultades y analizar percepciones."]),
+        (3, "Hipótesis", ["Hipótesis: el uso guiado de IA mejora la coherencia de los textos."]),
+    ],
+    2: [
+        (1, "Muestreo", ["Se utilizará un muestreo probabilístico estratificado; se fundamenta en la heterogeneidad de la población."]),
+        (2, "Instrumentos", ["Se aplicará un cuestionario estructurado y una entrevista semiestructurada con guía de preguntas."]),
+        (2, "Validez y fiabilidad", ["La validez de contenido se evaluará por jueces y la fiabilidad con alfa de Cronbach tras un pilotaje."]),
+        (2, "Tamaño de la muestra", ["El tamaño de la muestra se estimó con un nivel de confianza del 95% y un error del 5%, n=384."]),
+    ],
+    3: [
+        (1, "Operacionalización de variables", ["Variable independiente: uso de IA. Variable dependiente: calidad de escritura.",
+                                                "Definición conceptual, definición operacional, indicador, escala e instrumento para cada variable.",
+                                                "Unidad de análisis: estudiantes de grado."]),
+        (2, "Métodos de análisis", ["Se realizará análisis estadístico descriptivo, correlación y regresión; además análisis de contenido cualitativo."]),
+        (2, "Validación", ["Se prevé triangulación de fuentes y validación de instrumentos por expertos."]),
+        (2, "Aspectos éticos", ["Se solicitará consentimiento informado y se garantizará la confidencialidad y el anonimato."]),
+    ],
+    4: [
+        (1, "Introducción", ["La escritura académica constituye un desafío (García, 2019). Diversos autores coinciden (Pérez, 2020)."]),
+        (1, "Marco teórico", ["El marco teórico recupera aportes de la alfabetización académica (Hernández, 2014; Creswell, 2013).",
+                              "Se utilizó ChatGPT como herramienta de IA para organizar la búsqueda bibliográfica."]),
+        (1, "Referencias", ["García, J. (2019). Escritura académica. Revista de Educación, 12(3), 45-60. https://doi.org/10.1000/xyz"]),
+    ],
+    5: [
+        (1, "Desarrollo", ["Según la literatura (García, 2019), (Pérez, 2020), (López, 2018), (Martínez, 2021) y (Fernández, 2017).",
+                           "Las referencias se organizaron en Mendeley por carpeta y grupo, corrigiendo metadatos."]),
+        (1, "Bibliografía", ["Pérez, A. (2020). Metodología. Vol. 3, pp. 10-20. doi:10.1000/abc",
+                             "López, M. (2018). Investigación social. Nº 4. https://example.org"]),
+    ],
+    6: [
+        (1, "Tabla de contenido", ["Índice generado automáticamente; para actualizar el índice use la opción correspondiente."]),
+        (1, "Capítulo 1", ["Contenido del capítulo."]),
+        (2, "Sección 1.1", ["Contenido de la sección."]),
+        (3, "Apartado 1.1.1", ["Contenido del apartado."]),
+    ],
+    7: [
+        (1, "Estadística descriptiva", ["Se calcularon media, mediana, moda y desvío estándar para cada variable."]),
+        (2, "Pruebas de hipótesis", ["La prueba U de Mann-Whitney mostró diferencias significativas (p < 0.05)."]),
+        (2, "Confiabilidad", ["El alfa de Cronbach = 0.87 indica buena consistencia interna."]),
+        (2, "Correlación", ["La correlación de Spearman fue rho = 0.42; además se realizó un análisis de clúster k-means."]),
+    ],
+    8: [
+        (1, "Análisis temático", ["Se identificaron temas y subtemas a partir de la codificación de entrevistas."]),
+        (2, "Análisis de sentimiento", ["Los fragmentos se clasificaron en sentimiento positivo, negativo y neutral."]),
+        (2, "Análisis del discurso", ["Se analizó la función descriptiva y la función explicativa, las relaciones de poder y el posicionamiento."]),
+        (2, "Interpretación", ["Los resultados se contrastan con el modelo médico hegemónico y la medicina social."]),
+    ],
+}
+
+TABLAS = {
+    3: [["Variable", "Definición operacional", "Indicador", "Escala"],
+        ["Uso de IA", "Frecuencia de uso semanal", "Horas", "Razón"],
+        ["Calidad de escritura", "Puntaje de rúbrica", "Puntos", "Intervalo"]],
+    7: [["Variable", "Media", "Mediana", "DE"],
+        ["Edad", "21.4", "21", "2.3"],
+        ["Puntaje", "7.8", "8", "1.1"]],
+}
+
+
+def _relleno(rng, palabras):
+    out, n = [], 0
+    while n < palabras:
+        frase = rng.choice(RELLENO)
+        if rng.random() < 0.3:
+            frase += f" ({rng.choice(AUTORES)}, {rng.randint(1995, 2024)})"
+        out.append(frase.capitalize() + ".")
+        n += len(frase.split())
+    return " ".join(out)
+
+
+def contenido(practico: int, paginas: int, seed: int = 0):
+    """Lista de bloques (tipo, nivel, texto|filas) que luego se escriben como DOCX o PDF."""
+    rng = random.Random(seed * 100 + practico)
+    bloques = []
+    secciones = SECCIONES[practico]
+    relleno_por_seccion = max(0, paginas * PALABRAS_POR_PAGINA // len(secciones) - 40)
+    for i, (nivel, titulo, parrafos) in enumerate(secciones):
+        bloques.append(("titulo", nivel, titulo))
+        for p in parrafos:
+            bloques.append(("parrafo", 0, p))
+        if practico in TABLAS and i == 0:
+            bloques.append(("tabla", 0, TABLAS[practico]))
+        restante = relleno_por_seccion
+        while restante > 0:
+            n = min(restante, 120)
+            bloques.append(("parrafo", 0, _relleno(rng, n)))
+            restante -= n
+    return bloques
+
+
+def generar_docx(practico: int, paginas: int, seed: int = 0) -> bytes:
+    doc = Document()
+    for tipo, nivel, valor in contenido(practico, paginas, seed):
+        if tipo == "titulo":
+            doc.add_heading(valor, level=nivel)
+        elif tipo == "tabla":
+            tabla = doc.add_table(rows=len(valor), cols=len(valor[0]))
+            for r, fila in enumerate(valor):
+                for c, celda in enumerate(fila):
+                    tabla.cell(r, c).text = celda
+        else:
+            doc.add_paragraph(valor)
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+def _lineas_pdf(practico, paginas, seed):
+    for tipo, nivel, valor in contenido(practico, paginas, seed):
+        if tipo == "titulo":
+            yield ""
+            yield valor.upper()
+        elif tipo == "tabla":
+            for fila in valor:
+                yield "   ".join(fila)
+        else:
+            linea = ""
+            for palabra in valor.split():
+                if len(linea) + len(palabra) + 1 > CARACTERES_POR_LINEA:
+                    yield linea
+                    linea = palabra
+                else:
+                    linea = f"{linea} {palabra}" if linea else palabra
+            if linea:
+                yield linea
+
+
+def _escape_pdf(texto: str) -> bytes:
+    data = texto.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def generar_pdf(practico: int, paginas: int, seed: int = 0) -> bytes:
+    lineas = list(_lineas_pdf(practico, paginas, seed))
+    hojas = [lineas[i:i + LINEAS_POR_PAGINA] for i in range(0, len(lineas), LINEAS_POR_PAGINA)] or [[]]
+    objetos = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>", b""]
+    kids = []
+    for hoja in hojas:
+        stream = b"BT /F1 10 Tf 14 TL 50 790 Td " + b" ".join(b"(" + _escape_pdf(l) + b") '" for l in hoja) + b" ET"
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % len(objetos))
+        kids.append(len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % len(kids)
+    objetos.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objetos, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, len(objetos), xref)
+    return bytes(out)
+
+
+def generar(practico: int, paginas: int, formato: str, seed: int = 0) -> bytes:
+    return generar_docx(practico, paginas, seed) if formato == "docx" else generar_pdf(practico, paginas, seed)
@@ -0,0 +1,192 @@
+"""Benchmarks de parseo, rúbricas y flujo completo.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/run.py                      # informe
+    python benchmarks/run.py --save-baseline      # guarda benchmarks/baseline.json
+    python benchmarks/run.py --check              # falla si hay regresiones
+    python benchmarks/run.py --sizes 1 10 --only parse
+
+Para cada caso se informa el tiempo mediano por documento, el throughput
+(documentos/s y páginas/s) y el pico de memoria (tracemalloc, medido en una
+corrida aparte para no distorsionar los tiempos). Con --check se compara
+contra el baseline guardado y se sale con código 1 si algún caso es más
+lento o usa más memoria que el baseline por encima de la tolerancia.
+
+El baseline del repositorio guarda en `_maquina` dónde se midió (Python,
+sistema, CPUs, fecha): en otra máquina conviene regenerarlo antes de usar
+--check, porque los tiempos absolutos no son comparables.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+from generador import generar  # noqa: E402
+
+import correccion  # noqa: E402
+from correccion import (PRACTICO_LABELS, build_feedback_message, evaluar_features,  # noqa: E402
+                        evaluar_practico, extract_features, read_docx, read_pdf)
+from outbox import Outbox  # noqa: E402
+
+BASELINE = HERE / "baseline.json"
+SIZES = (1, 10, 100)
+FORMATS = ("docx", "pdf")
+RUBRICS = {n: getattr(correccion, f"corregir_practico_{n}") for n in PRACTICO_LABELS}
+READERS = {"docx": read_docx, "pdf": partial(read_pdf, workers=1)}
+
+
+class StubMailer:
+    """Sustituye SendGrid/SMTP: el flujo completo llega hasta la entrega sin red."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, destinatario, asunto, mensaje_texto):
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+def measure(fn, min_time=0.3, max_runs=50):
+    """Tiempo mediano por llamada (s), repitiendo hasta `min_time` o `max_runs`."""
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_runs and (not times or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def build_cases(sizes, only):
+    """Genera (nombre, función, páginas) para cada benchmark seleccionado."""
+    cache = {}
+
+    def doc_for(fmt, size, num):
+        if (fmt, size, num) not in cache:
+            data = generar(num, size, fmt)
+            cache[fmt, size, num] = (data, READERS[fmt](data))
+        return cache[fmt, size, num]
+
+    outbox_dir = tempfile.mkdtemp(prefix="bench-outbox-")
+    outbox = Outbox(Path(outbox_dir) / "outbox.sqlite3", StubMailer())
+
+    def full_flow(fmt, data, num):
+        doc = READERS[fmt](data)
+        features = extract_features(doc)
+        score, breakdown, summary = evaluar_features(num, features)
+        mensaje = build_feedback_message(num, score, breakdown, summary)
+        outbox.enqueue("alumno@example.com", f"Resultado — {PRACTICO_LABELS[num]}", mensaje)
+        outbox.drain_once()
+
+    for fmt in FORMATS:
+        for size in sizes:
+            # El costo de parseo no depende del práctico: se mide con uno representativo.
+            data, doc = doc_for(fmt, size, 4)
+            pages = doc.pages or size
+            if only in (None, "parse"):
+                yield f"parse/{fmt}/{size}p", partial(READERS[fmt], data), pages
+            if only in (None, "rubrics"):
+                for num, rubric in RUBRICS.items():
+                    _, doc_n = doc_for(fmt, size, num)
+                    features = extract_features(doc_n)
+                    yield f"rubric{num}/{fmt}/{size}p", partial(rubric, features), pages
+            if only in (None, "evaluar"):
+                for num in PRACTICO_LABELS:
+                    _, doc_n = doc_for(fmt, size, num)
+                    yield f"evaluar{num}/{fmt}/{size}p", partial(evaluar_practico, num, doc_n), pages
+            if only in (None, "flow"):
+                yield f"flow/{fmt}/{size}p", partial(full_flow, fmt, data, 4), pages
+
+
+def run(sizes, only, min_time):
+    results = {}
+    for name, fn, pages in build_cases(sizes, only):
+        seconds = measure(fn, min_time=min_time)
+        mem = peak_memory(fn)
+        results[name] = {
+            "seconds": seconds,
+            "docs_per_s": 1 / seconds if seconds else float("inf"),
+            "pages_per_s": pages / seconds if seconds else float("inf"),
+            "peak_bytes": mem,
+        }
+        print(f"{name:<24} {seconds * 1000:10.3f} ms  {results[name]['pages_per_s']:10.1f} pág/s  "
+              f"{mem / 1024:10.0f} KiB", flush=True)
+    return results
+
+
+def check(results, baseline, tolerance, mem_tolerance):
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        # Debajo de 0.1 ms el ruido del reloj domina: se ignora.
+        if r["seconds"] > base["seconds"] * (1 + tolerance) and r["seconds"] - base["seconds"] > 1e-4:
+            regressions.append(f"{name}: {base['seconds'] * 1000:.3f} ms → {r['seconds'] * 1000:.3f} ms")
+        if r["peak_bytes"] > base["peak_bytes"] * (1 + mem_tolerance) and r["peak_bytes"] - base["peak_bytes"] > 64 * 1024:
+            regressions.append(f"{name}: memoria {base['peak_bytes'] // 1024} KiB → {r['peak_bytes'] // 1024} KiB")
+    return regressions
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "sistema": platform.platform(), "procesador": platform.machine(),
+            "cpus": os.cpu_count(), "fecha": time.strftime("%Y-%m-%d")}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks de la corrección automática.")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Tamaños en páginas")
+    ap.add_argument("--only", choices=["parse", "rubrics", "evaluar", "flow"])
+    ap.add_argument("--min-time", type=float, default=0.3, help="Segundos mínimos de medición por caso")
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--check", action="store_true", help="Salir con 1 si hay regresiones")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Tolerancia de tiempo (0.25 = +25%%)")
+    ap.add_argument("--mem-tolerance", type=float, default=0.25)
+    args = ap.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.min_time)
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        merged = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        merged.update(results)
+        merged["_maquina"] = machine()
+        baseline_path.write_text(json.dumps(merged, indent=2, sort_keys=True))
+        print(f"Baseline guardado en {baseline_path}")
+    if args.check:
+        if not baseline_path.exists():
+            print(f"No hay baseline en {baseline_path}; ejecutar con --save-baseline", file=sys.stderr)
+            return 2
+        baseline = json.loads(baseline_path.read_text())
+        if "_maquina" in baseline:
+            print(f"Baseline medido en: {baseline['_maquina']}", file=sys.stderr)
+        regressions = check(results, baseline, args.tolerance, args.mem_tolerance)
+        for line in regressions:
+            print(f"REGRESIÓN {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
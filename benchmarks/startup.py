@@ -0,0 +1,64 @@
+"""Arranque en frío y re-ejecución de app.py.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/startup.py [--runs 5] [--reruns 20]
+
+- frío: primera ejecución completa de app.py en un intérprete nuevo (con
+  Streamlit ya importado: ese costo no depende de la app);
+- primera corrección: lo que tarda el primer documento después del arranque
+  (incluye cargar los lectores y compilar las rúbricas si son perezosos);
+- re-ejecución: mediana de las ejecuciones siguientes (cada interacción con
+  un widget vuelve a ejecutar app.py).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, sys, tempfile, time
+sys.path.insert(0, {root!r}); sys.path.insert(0, {root!r} + "/benchmarks")
+import streamlit
+from streamlit.testing.v1 import AppTest
+from generador import generar
+data = generar(4, 3, "docx")
+
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.secrets["OUTBOX_DB"] = tempfile.mkdtemp() + "/outbox.sqlite3"
+t0 = time.perf_counter(); at.run(); cold = time.perf_counter() - t0
+
+t0 = time.perf_counter()
+import correccion
+doc = correccion.read_docx(data)
+correccion.evaluar_features(4, correccion.extract_features(doc))
+first = time.perf_counter() - t0
+
+reruns = []
+for _ in range({reruns}):
+    t0 = time.perf_counter(); at.run(); reruns.append(time.perf_counter() - t0)
+print(json.dumps({{"cold": cold, "first": first, "rerun": sorted(reruns)[len(reruns) // 2]}}))
+"""
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tiempo de arranque y re-ejecución de app.py.")
+    ap.add_argument("--runs", type=int, default=5, help="Intérpretes nuevos a lanzar")
+    ap.add_argument("--reruns", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    code = CHILD.format(root=str(ROOT), app=str(ROOT / "app.py"), reruns=args.reruns)
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    for key, label in (("cold", "arranque en frío"), ("first", "primera corrección"), ("rerun", "re-ejecución")):
+        print(f"{label:<20} {statistics.median(s[key] for s in samples) * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
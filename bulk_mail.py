@@ -0,0 +1,145 @@
+"""Envío masivo de resultados con SendGrid (varias personalizations por pedido).
+
+Cada pedido a la API lleva como mucho SENDGRID_MAX_RECIPIENTS destinatarios
+entre to y bcc de todas las personalizations (con TEACHER_BCC, la mitad de
+alumnos por pedido) y comparten un solo cliente/conexión; el texto de cada
+alumno viaja como sustitución del marcador MESSAGE_TAG. Si SendGrid rechaza algunas
+personalizations (400) se reenvía el resto y solo los destinatarios que
+fallaron pasan por la conexión SMTP reutilizada del Mailer. Si el pedido ni
+siquiera llega (error de red), todo ese bloque pasa por SMTP.
+
+El transporte es cualquier objeto con `send(body: dict) -> (status, texto)`,
+lo que permite probar todo sin red (ver RecordingTransport).
+"""
+import json
+import logging
+import re
+
+from outbox import html_body
+
+log = logging.getLogger(__name__)
+
+# Tope de SendGrid por pedido: cuenta to, cc y bcc de todas las personalizations.
+SENDGRID_MAX_RECIPIENTS = 1000
+MESSAGE_TAG = "-mensaje-"
+
+_FIELD_INDEX = re.compile(r"^personalizations\.(\d+)\b")
+
+
+class SendGridTransport:
+    def __init__(self, api_key):
+        from sendgrid import SendGridAPIClient
+        self.client = SendGridAPIClient(api_key)
+
+    def send(self, body: dict):
+        from python_http_client.exceptions import HTTPError
+        try:
+            resp = self.client.client.mail.send.post(request_body=body)
+            return resp.status_code, ""
+        except HTTPError as e:
+            return e.status_code, e.body.decode("utf-8", "replace") if isinstance(e.body, bytes) else str(e.body)
+
+
+class RecordingTransport:
+    """Transporte de prueba: guarda los pedidos y responde con `responses` (o 202)."""
+
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = list(responses or [])
+
+    def send(self, body: dict):
+        self.requests.append(body)
+        return self.responses.pop(0) if self.responses else (202, "")
+
+
+def build_bulk_request(mailer, items) -> dict:
+    """Arma el cuerpo v3 de /mail/send para `items` = [(destinatario, asunto, texto)]."""
+    personalizations = []
+    for destinatario, asunto, texto in items:
+        p = {"to": [{"email": destinatario}], "subject": asunto, "substitutions": {MESSAGE_TAG: texto}}
+        if mailer.bcc and mailer.bcc.lower() != destinatario.lower():
+            p["bcc"] = [{"email": mailer.bcc}]
+        personalizations.append(p)
+    body = {
+        "personalizations": personalizations,
+        "from": {"email": mailer.sender_email, "name": mailer.sender_name},
+        "content": [
+            {"type": "text/plain", "value": MESSAGE_TAG},
+            {"type": "text/html", "value": html_body(MESSAGE_TAG)},
+        ],
+    }
+    if mailer.reply_to:
+        body["reply_to"] = {"email": mailer.reply_to}
+    return body
+
+
+def rejected_personalizations(response_text: str) -> set:
+    """Índices de personalizations señalados en un error 400 de SendGrid."""
+    try:
+        errors = json.loads(response_text).get("errors", [])
+    except (ValueError, AttributeError):
+        return set()
+    indices = set()
+    for err in errors:
+        m = _FIELD_INDEX.match(err.get("field") or "")
+        if m:
+            indices.add(int(m.group(1)))
+    return indices
+
+
+def batch_size_for(mailer) -> int:
+    """Alumnos por pedido: cada personalization suma su `to` y, si hay copia al docente, el `bcc`."""
+    return SENDGRID_MAX_RECIPIENTS // (1 + bool(mailer.bcc))
+
+
+def bulk_send(mailer, items, transport=None, batch_size=None) -> list:
+    """Envía `items` y devuelve un estado por destinatario, en el mismo orden.
+
+    Cada estado es {"destinatario", "via": "sendgrid" | "smtp" | None, "error"}.
+    """
+    items = list(items)
+    statuses = [{"destinatario": d, "via": None, "error": ""} for d, _, _ in items]
+    if transport is None and mailer.config.get("SENDGRID_API_KEY"):
+        transport = SendGridTransport(mailer.config["SENDGRID_API_KEY"])
+
+    batch_size = batch_size or batch_size_for(mailer)
+    fallback = []
+    if transport is None:
+        fallback = list(range(len(items)))
+    else:
+        for start in range(0, len(items), batch_size):
+            pending = list(range(start, min(start + batch_size, len(items))))
+            # Un segundo intento solo con las personalizations que SendGrid no objetó.
+            for _ in range(2):
+                try:
+                    status, text = transport.send(build_bulk_request(mailer, [items[i] for i in pending]))
+                except Exception as e:
+                    # Red caída, timeout o conexión cortada: el bloque entero pasa por SMTP.
+                    log.warning("SendGrid no respondió para %d destinatarios: %s", len(pending), e)
+                    status = f"{type(e).__name__}: {e}"
+                    break
+                if 200 <= status < 300:
+                    for i in pending:
+                        statuses[i]["via"] = "sendgrid"
+                    break
+                rejected = rejected_personalizations(text) if status == 400 else set()
+                log.warning("SendGrid devolvió %s para %d destinatarios", status, len(pending))
+                if not rejected or len(rejected) >= len(pending):
+                    break
+                for j in sorted(rejected):
+                    statuses[pending[j]]["error"] = f"SendGrid {status}"
+                    fallback.append(pending[j])
+                pending = [i for j, i in enumerate(pending) if j not in rejected]
+            if any(statuses[i]["via"] is None for i in pending):
+                for i in pending:
+                    statuses[i]["error"] = f"SendGrid {status}"
+                fallback.extend(pending)
+
+    for i in sorted(fallback):
+        destinatario, asunto, texto = items[i]
+        try:
+            mailer.smtp.send(mailer.build_smtp_message(destinatario, asunto, texto))
+            statuses[i].update(via="smtp", error="")
+        except Exception as e:
+            statuses[i]["error"] = f"{statuses[i]['error']}; SMTP: {e}".lstrip("; ")
+    return statuses
@@ -0,0 +1,207 @@
+"""Citas en el texto y lista de referencias (APA) en una sola pasada.
+
+Reconoce citas parentéticas, incluso varias en el mismo paréntesis y con
+varios años: (García, 2019), (García & Pérez, 2020; López et al., 2018),
+(García, 2019a, 2020, p. 12), (OMS, s.f.). También reconoce citas
+narrativas como Pérez (2020) o Hernández y Sampieri (2014). En la lista
+final lee las entradas con el formato `Apellido, I. (Año). Título...`, con
+su DOI o URL, y cruza cada cita con su referencia.
+
+Todas las expresiones tienen repeticiones acotadas y alternativas que
+empiezan por caracteres distintos. En cada posición el motor hace un
+trabajo acotado por una constante, así que el costo es lineal en el largo
+del texto incluso con entradas patológicas (ver
+benchmarks/citas_peor_caso.py).
+"""
+import re
+
+from documento import fold
+
+_UP = "A-ZÁÉÍÓÚÜÑ"
+
+
+def _authors(initial):
+    """Uno o más apellidos: `García`, `García et al.`, `García, Pérez y López`.
+
+    \\b en ambos extremos: un apellido solo se intenta al comienzo de una palabra
+    y no se prueba cada prefijo de una palabra larga.
+    """
+    surname = (rf"\b(?:(?:de|del|la|van|von|da|di|le)\s{{1,3}}){{0,2}}{initial}[^\W\d_]{{0,30}}"
+               rf"(?:[-'’][{_UP}]?[^\W\d_]{{1,30}})?\b")
+    return rf"{surname}(?:\s{{1,3}}et\s{{1,3}}al\.?|(?:,\s{{0,3}}{surname}){{0,6}},?\s{{1,3}}(?:y|&|and|e)\s{{1,3}}{surname})?"
+
+
+# Fuera de paréntesis solo apellidos con mayúscula (si no, «la escuela (2019)» sería
+# una cita narrativa); dentro, también en minúscula: (garcía, 2019).
+_AUTHORS = _authors(f"[{_UP}]")
+_AUTHORS_ANY_CASE = _authors(r"[^\W\d_]")
+_YEAR = r"(?:(?:19|20)\d\d[a-z]?|[sS]\.\s?[fF]\.?|[nN]\.\s?[dD]\.|en prensa)"
+
+# Un solo recorrido por los paréntesis. Si solo tienen el año, es una cita narrativa
+# y los autores se buscan en los NARRATIVE_LOOKBACK caracteres previos.
+_PAREN = re.compile(r"\((?P<contenido>[^()]{1,300})\)")
+_NARRATIVE_YEAR = re.compile(rf"(?P<anio>{_YEAR})(?:[,;:][^()]{{0,40}})?")
+_NARRATIVE_AUTHORS = re.compile(rf"(?P<autores>{_AUTHORS})\s{{0,2}}\Z")
+NARRATIVE_LOOKBACK = 120
+_AUTHOR_YEAR = re.compile(rf"(?P<autores>{_AUTHORS_ANY_CASE}),\s{{0,3}}(?P<anios>{_YEAR}(?:,\s{{0,3}}{_YEAR}){{0,5}})")
+_YEAR_ONLY = re.compile(_YEAR)
+
+# Entrada de la lista: autores (personas u organización) y (Año) al comienzo del párrafo;
+# el primer apellido puede empezar con partícula en minúscula (de la Fuente, M.).
+_PARTICLES = r"(?:(?:de|del|la|van|von|da|di|le)\s{1,3}){0,2}"
+_REF = re.compile(rf"\s{{0,3}}(?:\d{{1,3}}[.)]\s{{1,3}})?(?P<autores>{_PARTICLES}[{_UP}][^()]{{1,400}}?)"
+                  rf"\((?P<anio>{_YEAR})[^()]{{0,30}}\)")
+_REF_INITIALS = re.compile(rf",\s{{0,3}}[{_UP}]\.")
+_ET_AL = re.compile(r"\bet\s{1,3}al\b")
+_DOI = re.compile(r"\b10\.\d{4,9}/[^\s\"<>]{1,200}")
+_URL = re.compile(r"https?://[^\s\"<>]{1,300}")
+
+BIB_HEADINGS = ("bibliografia", "referencias", "referencias bibliograficas", "bibliografia consultada",
+                "lista de referencias", "fuentes")
+END_HEADINGS = ("anexo", "apendice")
+MAX_REF_CHARS = 300
+
+
+def _year_key(anio: str) -> str:
+    anio = anio.lower()
+    if anio[0] in "sn":
+        return "s.f."
+    return anio
+
+
+def _surname_words(autores: str) -> list:
+    """Palabras del primer apellido, sin tildes ('García-Márquez' → ['garcia', 'marquez'])."""
+    first = re.split(r",|\s(?:y|&|and|e|et)\s", autores, maxsplit=1)[0]
+    return [w for w in re.findall(r"[^\W\d_]+", fold(first)) if len(w) > 1 and w not in
+            ("de", "del", "la", "van", "von", "da", "di", "le")]
+
+
+def _heading(paragraph: str) -> str:
+    return fold(paragraph).strip(" \t:.-0123456789") if len(paragraph) <= 60 else ""
+
+
+class CitationReport:
+    """Citas (autor, año), referencias y el cruce entre ambas."""
+    __slots__ = ("citas", "referencias", "sin_referencia", "no_citadas", "seccion")
+
+    def __init__(self, citas, referencias, sin_referencia, no_citadas, seccion):
+        self.citas = citas                    # [(autores, año)]
+        self.referencias = referencias        # [(autores, año, título?, doi, url)]
+        self.sin_referencia = sin_referencia  # ["Autor, Año"] citados sin entrada en la lista
+        self.no_citadas = no_citadas          # ["Autor, Año"] de la lista que no se citan
+        self.seccion = seccion                # hay título "Referencias"/"Bibliografía"
+
+    def completas(self) -> int:
+        """Referencias con autor, año, título y DOI o URL."""
+        return sum(1 for _, _, titulo, doi, url in self.referencias if titulo and (doi or url))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls([tuple(c) for c in d["citas"]], [tuple(r) for r in d["referencias"]],
+                   d["sin_referencia"], d["no_citadas"], d["seccion"])
+
+
+def _reference(entry: str, m) -> tuple:
+    """(autores, año, título?, doi, url); sin match es una entrada mal formada: año vacío."""
+    doi = _DOI.search(entry)
+    url = _URL.search(entry)
+    doi, url = doi.group(0).rstrip(".,;") if doi else "", url.group(0).rstrip(".,;") if url else ""
+    if m is None:
+        return entry.strip()[:80], "", False, doi, url
+    titulo = entry[m.end():].lstrip(" .").split(".", 1)[0].strip()
+    return m["autores"].strip().rstrip(",. "), m["anio"], len(titulo) >= 3, doi, url
+
+
+def _is_reference(paragraph: str, en_lista: bool):
+    """Match de _REF si el párrafo empieza como una entrada APA.
+
+    Dentro de la lista alcanza con `Apellido, I.` u `Organización. (Año)`. Fuera de ella
+    se exige la forma completa `Apellido, I. ... (Año).` y sin «et al.»: así «García et al.
+    (2018) sostienen...» o «Pérez (2020) sostiene...» siguen siendo cuerpo (citas narrativas).
+    """
+    m = _REF.match(paragraph)
+    if m is None:
+        return None
+    autores = m["autores"]
+    if en_lista:
+        ok = _REF_INITIALS.search(autores) or len(autores) <= 120 and autores.rstrip().endswith(".")
+    else:
+        ok = (_REF_INITIALS.search(autores) and not _ET_AL.search(autores)
+              and paragraph[m.end():m.end() + 4].lstrip().startswith("."))
+    return m if ok else None
+
+
+def _citations(body: str) -> list:
+    citas = []
+    prev = 0
+    for m in _PAREN.finditer(body):
+        contenido, inicio, prev_end = m["contenido"], m.start(), prev
+        prev = m.end()
+        anio = _NARRATIVE_YEAR.fullmatch(contenido)
+        if anio is not None:
+            autores = _NARRATIVE_AUTHORS.search(body, max(prev_end, inicio - NARRATIVE_LOOKBACK), inicio)
+            if autores is not None:
+                citas.append((autores["autores"], anio["anio"]))
+            continue
+        for segmento in contenido.split(";"):
+            c = _AUTHOR_YEAR.search(segmento)
+            if c is not None:
+                citas.extend((c["autores"], y) for y in _YEAR_ONLY.findall(c["anios"]))
+    return citas
+
+
+def scan(paragraphs, continuation=False) -> CitationReport:
+    """Separa cuerpo y lista de referencias, extrae ambas y las cruza.
+
+    Con `continuation=True` (PDF, un párrafo por renglón) los renglones de la lista
+    que no empiezan una entrada se agregan a la anterior; si no, son entradas mal formadas.
+    """
+    inicio = None
+    for i in range(len(paragraphs) - 1, -1, -1):
+        # El último título "Referencias": el primero suele ser el del índice.
+        if _heading(paragraphs[i]) in BIB_HEADINGS:
+            inicio = i
+            break
+
+    body, entradas = [], []  # entradas: [texto, match]
+    en_lista = False
+    for i, p in enumerate(paragraphs):
+        if i == inicio:
+            en_lista = True
+            continue
+        if not p.strip():
+            continue
+        if en_lista and _heading(p).startswith(END_HEADINGS):
+            en_lista = False
+        m = _is_reference(p, en_lista)
+        if m is not None:
+            entradas.append([p, m])
+        elif not en_lista or len(p) > MAX_REF_CHARS:
+            # Un párrafo largo que no empieza como referencia es texto (p. ej. una
+            # sección sin título después de la lista).
+            body.append(p)
+        elif continuation and entradas:
+            # Renglón siguiente de la misma entrada: solo aporta DOI/URL.
+            entradas[-1][0] += " " + p
+        else:
+            entradas.append([p, None])
+
+    citas = _citations("\n".join(body))
+    referencias = [_reference(texto, m) for texto, m in entradas]
+
+    indice = {}
+    for n, (autores, anio, *_rest) in enumerate(referencias):
+        for w in _surname_words(autores) if anio else ():
+            indice.setdefault((_year_key(anio), w), set()).add(n)
+    citadas, sin_referencia = set(), []
+    for autores, anio in citas:
+        hallada = set().union(*(indice.get((_year_key(anio), w), ()) for w in _surname_words(autores)))
+        if hallada:
+            citadas |= hallada
+        else:
+            sin_referencia.append(f"{autores}, {anio}")
+    no_citadas = [f"{r[0]}, {r[1]}" for n, r in enumerate(referencias) if n not in citadas and r[1]]
+    return CitationReport(citas, referencias, list(dict.fromkeys(sin_referencia)), no_citadas, inicio is not None)
@@ -0,0 +1,733 @@
+"""Núcleo de la corrección: lectura de archivos, rúbricas y router.
+
+No depende de Streamlit, de modo que lo pueden usar la app, el modo por lotes
+y los procesos de trabajo.
+
+pdfminer se importa al leer el primer PDF (los .docx se leen con la
+biblioteca estándar) y el matcher de palabras clave se compila con la primera corrección: importar
+el módulo (cada arranque de la app) no paga ninguno de los dos costos.
+"""
+import atexit, hashlib, io, json, mmap, os, posixpath, re, threading, time, zipfile
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from documento import ParsedDocument, fold
+from keyword_matcher import KeywordHits, KeywordMatcher
+from citation_scanner import CitationReport, scan as scan_citations
+
+# ---------------------------------
+# Configuración
+# ---------------------------------
+# Límites de lectura de PDF: a partir de ahí se corrige con lo extraído y se avisa.
+PDF_MAX_PAGES = 150
+PDF_TIME_BUDGET_S = 60.0
+# PDFs con al menos esta cantidad de páginas se reparten entre procesos.
+PDF_PARALLEL_MIN_PAGES = 40
+PDF_PARALLEL_WORKERS = min(4, os.cpu_count() or 1)
+
+# Subir este número cuando cambie alguna rúbrica o sus palabras clave: los
+# resultados guardados con otra versión dejan de reutilizarse (result_store.py)
+# y regrade.py los recalcula desde los rasgos guardados.
+RUBRIC_VERSION = 4
+
+# Subir este número cuando cambie lo que extrae extract_features (no hace falta al
+# tocar palabras clave o patrones: entran solos en features_version()). Los rasgos
+# guardados con otra versión se recalculan desde el texto guardado (regrade.py).
+FEATURES_VERSION = 3
+
+RUBRIC_MAX = {1: 100, 2: 100, 3: 100, 4: 100, 5: 100, 6: 100, 7: 100, 8: 100}
+
+PRACTICO_LABELS = {
+    1: "Práctico Nº 1 — IA en la escritura del proyecto",
+    2: "Práctico Nº 2 — Establecimiento de Métodos de Recolección de Datos y Tipos de Muestreos. Tamaño de la Muestra",
+    3: "Práctico Nº 3 — Operacionalización de Variables y Determinación de Métodos de Análisis de Datos",
+    4: "Práctico Nº 4 — Introducción + Marco teórico + Búsqueda (≈500 palabras en total)",
+    5: "Trabajo práctico Módulo 5 — Mendeley: citas en Word y bibliografía",
+    6: "Trabajo práctico Módulo 6 — Estilos de Word e índice automático",
+    7: "Práctico Nº 7 — Análisis cuantitativo",
+    8: "Práctico Nº 8 — Análisis cualitativo",
+}
+
+# ---------------------------------
+# Lectura de archivos
+# ---------------------------------
+# DOCX: se recorre word/document.xml en streaming (sin el modelo de python-docx).
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_W_BODY, _W_P, _W_T, _W_PPR, _W_PSTYLE, _W_BR = (W_NS + t for t in ("body", "p", "t", "pPr", "pStyle", "br"))
+# Equivalentes de texto de los elementos de un run (como Paragraph.text de python-docx).
+_DOCX_RUN_TEXT = {W_NS + "tab": "\t", W_NS + "ptab": "\t", W_NS + "cr": "\n", W_NS + "noBreakHyphen": "-"}
+# Cuadros de texto y dibujos: python-docx tampoco los incluye en el texto del párrafo.
+_DOCX_SKIP = {W_NS + "drawing", W_NS + "pict", W_NS + "object", MC_NS + "AlternateContent"}
+# Nombres internos de styles.xml que Word muestra distinto (BabelFish de python-docx).
+_DOCX_UI_STYLE_NAMES = {"caption": "Caption", "footer": "Footer", "header": "Header",
+                        **{f"heading {i}": f"Heading {i}" for i in range(1, 10)}}
+
+class _MappedFile(io.RawIOBase):
+    """Archivo de lectura sobre un mmap (zipfile necesita seekable(), que mmap no tiene)."""
+
+    def __init__(self, mapped):
+        self.mapped, self.pos = mapped, 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buf):
+        chunk = self.mapped[self.pos:self.pos + len(buf)]
+        buf[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.pos = max(0, offset + (0, self.pos, len(self.mapped))[whence])
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+def open_buffer(file_bytes):
+    """Archivo de lectura sobre bytes o sobre un mmap (subidas volcadas a disco), sin copiar el contenido."""
+    if isinstance(file_bytes, mmap.mmap):
+        return _MappedFile(file_bytes)
+    return io.BytesIO(file_bytes)
+
+def _docx_rel_target(zf, part, rel_type):
+    """Ruta dentro del ZIP de la relación `rel_type` de `part` ("" = el paquete)."""
+    folder, name = posixpath.split(part)
+    rels = posixpath.join(folder, "_rels", name + ".rels")
+    if rels not in zf.NameToInfo:
+        return None
+    for rel in ET.parse(zf.open(rels)).getroot().iter(REL_NS + "Relationship"):
+        if rel.get("Type", "").endswith("/" + rel_type) and rel.get("TargetMode") != "External":
+            target = rel.get("Target", "")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+    return None
+
+def _docx_style_names(zf, path):
+    """{styleId: nombre visible} de los estilos de párrafo y el nombre del estilo por defecto."""
+    names, default = {}, ""
+    if not path or path not in zf.NameToInfo:
+        return names, default
+    with zf.open(path) as fh:
+        for _, style in ET.iterparse(fh):
+            if style.tag != W_NS + "style":
+                continue
+            if style.get(W_NS + "type") == "paragraph":
+                name_el = style.find(W_NS + "name")
+                name = name_el.get(W_NS + "val", "") if name_el is not None else ""
+                name = _DOCX_UI_STYLE_NAMES.get(name, name)
+                names[style.get(W_NS + "styleId")] = name
+                if style.get(W_NS + "default") in ("1", "true", "on"):
+                    default = name
+            style.clear()
+    return names, default
+
+def read_docx(file_bytes: bytes) -> ParsedDocument:
+    """Párrafos (incluidas las celdas de tablas) en orden de documento, con su estilo.
+
+    Se procesa un párrafo a la vez y se descarta, así que la memoria no crece
+    con el tamaño del archivo como con el árbol completo de python-docx.
+    """
+    paragraphs, styles = [], []
+    with zipfile.ZipFile(open_buffer(file_bytes)) as zf:
+        main = _docx_rel_target(zf, "", "officeDocument") or "word/document.xml"
+        style_names, default_style = _docx_style_names(zf, _docx_rel_target(zf, main, "styles"))
+        parts, style_id = [], None
+        depth, skip, in_ppr, body = 0, 0, False, None
+        with zf.open(main) as fh:
+            for event, el in ET.iterparse(fh, events=("start", "end")):
+                tag = el.tag
+                if event == "start":
+                    depth += 1
+                    if tag in _DOCX_SKIP:
+                        skip += 1
+                    elif tag == _W_PPR:
+                        in_ppr = True
+                    elif tag == _W_BODY:
+                        body = el
+                    continue
+                depth -= 1
+                if tag in _DOCX_SKIP:
+                    skip -= 1
+                elif skip:
+                    continue
+                elif tag == _W_T:
+                    parts.append(el.text or "")
+                elif tag == _W_P:
+                    txt = "".join(parts).strip()
+                    if txt:
+                        paragraphs.append(txt)
+                        styles.append(style_names.get(style_id, default_style))
+                    parts, style_id = [], None
+                    el.clear()
+                elif tag == _W_PPR:
+                    in_ppr = False
+                elif in_ppr:
+                    if tag == _W_PSTYLE and style_id is None:
+                        style_id = el.get(W_NS + "val")
+                elif tag in _DOCX_RUN_TEXT:
+                    parts.append(_DOCX_RUN_TEXT[tag])
+                elif tag == _W_BR and el.get(W_NS + "type", "textWrapping") == "textWrapping":
+                    parts.append("\n")
+                if depth == 2 and body is not None:
+                    body.clear()  # terminó un bloque de primer nivel (párrafo o tabla)
+    return ParsedDocument("\n".join(paragraphs), paragraphs, styles, "docx")
+
+def docx_page_count(file_bytes: bytes):
+    """Páginas según docProps/app.xml (Word las guarda al grabar); None si no figuran."""
+    try:
+        with zipfile.ZipFile(open_buffer(file_bytes)) as zf, zf.open("docProps/app.xml") as fh:
+            for _, el in ET.iterparse(fh):
+                if el.tag.endswith("}Pages"):
+                    return int(el.text)
+    except (KeyError, ValueError, TypeError, zipfile.BadZipFile, ET.ParseError):
+        pass
+    return None
+
+def pdf_page_count(file_bytes: bytes):
+    """Cantidad de páginas según el catálogo (sin interpretar contenido); None si no se puede leer."""
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+    try:
+        doc = PDFDocument(PDFParser(open_buffer(file_bytes)))
+        return int(resolve1(resolve1(doc.catalog["Pages"])["Count"]))
+    except Exception:
+        return None
+
+def _iter_pdf_pages(file_bytes: bytes, pagenos=None, maxpages=0):
+    """Genera el texto de cada página, una a la vez (misma salida que extract_text)."""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    rsrcmgr = PDFResourceManager(caching=True)
+    out = io.StringIO()
+    device = TextConverter(rsrcmgr, out, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    try:
+        for page in PDFPage.get_pages(open_buffer(file_bytes), pagenos, maxpages=maxpages):
+            interpreter.process_page(page)
+            yield out.getvalue()
+            out.seek(0); out.truncate()
+    finally:
+        device.close()
+
+def _extract_page_range(file_bytes: bytes, start: int, stop: int, deadline: float):
+    """Extrae las páginas [start, stop) hasta `deadline` (time.time()); devuelve (textos, completo)."""
+    pages = []
+    for text in _iter_pdf_pages(file_bytes, set(range(start, stop))):
+        pages.append(text)
+        if time.time() > deadline and len(pages) < stop - start:
+            return pages, False
+    return pages, True
+
+_pdf_pool_lock = threading.Lock()
+_pdf_pool_executor = None
+
+def _pdf_pool():
+    """Pool de procesos compartido para leer PDFs largos; se crea una vez por proceso.
+
+    Usa "spawn": hacer fork desde la app (hilos de Streamlit, de la bandeja de
+    salida, conexiones SQLite abiertas) puede dejar locks tomados en el hijo.
+    Arrancar procesos con spawn es caro, por eso el pool se reutiliza entre
+    llamadas en lugar de crearse en cada PDF.
+    """
+    global _pdf_pool_executor
+    with _pdf_pool_lock:
+        if _pdf_pool_executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _pdf_pool_executor = ProcessPoolExecutor(max_workers=PDF_PARALLEL_WORKERS,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pdf_pool_executor.shutdown, cancel_futures=True)
+        return _pdf_pool_executor
+
+def _reset_pdf_pool(pool):
+    """Descarta el pool si se rompió (un proceso murió): la próxima lectura crea otro."""
+    global _pdf_pool_executor
+    with _pdf_pool_lock:
+        if _pdf_pool_executor is pool:
+            _pdf_pool_executor = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def read_pdf(file_bytes: bytes, max_pages=None, time_budget=None, workers=None) -> ParsedDocument:
+    """Lee el PDF página por página, con tope de páginas y de tiempo.
+
+    Si se alcanza un tope, el documento se corrige con lo extraído y queda
+    marcado con `truncated` y `truncation_reason`. Los PDFs largos se reparten
+    por rangos de páginas entre procesos (`workers=1` fuerza lectura en serie).
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    time_budget = PDF_TIME_BUDGET_S if time_budget is None else time_budget
+    workers = min(PDF_PARALLEL_WORKERS if workers is None else workers, os.cpu_count() or 1)
+    deadline = time.time() + time_budget
+    total_pages = pdf_page_count(file_bytes)
+    n_pages = min(total_pages, max_pages) if total_pages is not None else max_pages
+    reason = ""
+    if total_pages is not None and total_pages > max_pages:
+        reason = f"se leyeron solo las primeras {max_pages} de {total_pages} páginas"
+
+    page_texts = []
+    if workers > 1 and total_pages is not None and n_pages >= PDF_PARALLEL_MIN_PAGES:
+        step = -(-n_pages // workers)
+        ranges = [(a, min(a + step, n_pages)) for a in range(0, n_pages, step)]
+        from concurrent.futures.process import BrokenProcessPool
+        if isinstance(file_bytes, mmap.mmap):
+            file_bytes = file_bytes[:]  # un mmap no se puede enviar a otro proceso
+        pool = _pdf_pool()
+        futures = [pool.submit(_extract_page_range, file_bytes, a, b, deadline) for a, b in ranges]
+        try:
+            for fut in futures:
+                texts, ok = fut.result()
+                page_texts.extend(texts)
+                if not ok:
+                    # Solo el prefijo continuo: los rangos siguientes dejarían huecos en el medio.
+                    reason = (f"se agotó el tiempo de lectura ({time_budget:g} s); "
+                              f"se leyeron las primeras {len(page_texts)} páginas")
+                    break
+        except BrokenProcessPool:
+            _reset_pdf_pool(pool)
+            raise
+        finally:
+            for fut in futures:
+                fut.cancel()
+    else:
+        for text in _iter_pdf_pages(file_bytes, maxpages=max_pages):
+            page_texts.append(text)
+            if time.time() > deadline and (total_pages is None or len(page_texts) < n_pages):
+                reason = (f"se agotó el tiempo de lectura ({time_budget:g} s); "
+                          f"se leyeron las primeras {len(page_texts)} páginas")
+                break
+        if not reason and total_pages is None and len(page_texts) >= max_pages:
+            reason = f"se leyeron solo las primeras {max_pages} páginas"
+
+    paragraphs = []
+    for text in page_texts:
+        paragraphs.extend(line.strip() for line in text.splitlines() if line.strip())
+    return ParsedDocument("".join(page_texts), paragraphs, [""] * len(paragraphs), "pdf",
+                          pages=len(page_texts), total_pages=total_pages,
+                          truncated=bool(reason), truncation_reason=reason)
+
+READERS = {".docx": read_docx, ".pdf": read_pdf}
+
+def parse_bytes(file_bytes: bytes, suffix: str) -> ParsedDocument:
+    """Parsea un archivo según su extensión; ValueError si no está soportada."""
+    reader = READERS.get(suffix.lower())
+    if reader is None:
+        raise ValueError(f"Formato no soportado: {suffix}")
+    return reader(file_bytes)
+
+# ---------------------------------
+# Palabras clave de las rúbricas
+# ---------------------------------
+# Todas las claves que consultan las rúbricas; se compilan una sola vez (ver
+# rubric_matcher) y cada documento se recorre en una única pasada. Se comparan
+# sin tildes (ver documento.fold), así que basta con escribir una variante.
+KW_TEMA_TITULO = ["tema", "título"]
+KW_OBJ_GENERAL = ["objetivo general", "objetivo principal"]
+KW_OBJ_ESPECIFICOS = ["objetivos específicos"]
+KW_HIPOTESIS = ["hipótesis"]
+KW_OPERACIONALIZACION = ["variable","independiente","dependiente","definición conceptual",
+                         "definición operacional","indicador","escala","instrumento",
+                         "unidad de análisis","unidades de análisis"]
+KW_METODOS_ANALISIS = ["análisis","regresión","correlación","anova","t-student","chi-cuadrado",
+                       "temático","codificación","grounded theory","análisis de contenido","estadístico","cualitativo"]
+KW_VALIDACION = ["validez","fiabilidad","confiabilidad","triangulación","alfa de cronbach","pilotaje","validación de instrumentos"]
+KW_ETICA = ["ética","consentimiento informado","anonimato","confidencialidad"]
+KW_MUESTREO = ["muestreo","probabilístico","no probabilístico","aleatorio","estratificado",
+               "intencionado","conglomerados","bola de nieve","sistemático"]
+KW_FUNDAMENTACION = ["fundament", "justific"]
+KW_INSTRUMENTOS = ["cuestionario","encuesta","entrevista","guía","observación","escala","test"]
+KW_VALIDEZ_FIABILIDAD = ["validez","fiabilidad","confiabilidad","pilotaje","alfa de cronbach"]
+KW_TAMANO_MUESTRA = ["tamaño de la muestra","n=","muestra de","cálculo muestral","error","confianza"]
+KW_SECCIONES_P4 = ["introducción", "marco teórico"]
+KW_IA = ["inteligencia artificial","chatgpt","herramienta de ia","ia"]
+KW_BIBLIOGRAFIA = ["bibliografía", "referencias", "referencias bibliográficas"]
+KW_MENDELEY = ["mendeley","carpeta","grupo","metadatos","corrigiendo metadatos"]
+KW_TOC = ["tabla de contenido", "índice", "contenido"]
+KW_ACTUALIZAR_INDICE = ["actualizar índice","actualizar el índice","update table of contents"]
+KW_DESCRIPTIVAS = ["media","mediana","moda","desvío estándar"]
+KW_MANN_WHITNEY = ["mann-whitney", "mann whitney", "u de mann"]
+KW_CRONBACH = ["cronbach", "α", "alfa", "alpha"]
+KW_SPEARMAN = ["spearman", "ρ", "rho"]
+KW_CLUSTER = ["clúster", "k-means", "agrupamiento"]
+KW_TEMATICO = ["análisis temático", "temas", "subtemas", "subtema"]
+KW_SENTIMIENTO = ["sentimiento","positiv","negativ","neutral"]
+KW_DISCURSO = ["análisis del discurso","función descriptiva","función explicativa",
+               "poder","posicionamiento","ideolog","complejid"]
+KW_MMH = ["modelo médico hegemónico"]
+KW_MEDICINA_SOCIAL = ["medicina social"]
+KW_SUELTAS = ["paradigma"]
+
+# Patrones no literales; se cuentan sobre el texto en minúsculas y sin tildes.
+RUBRIC_PATTERNS = {
+    "pregunta_investigacion": r"pregunta(s)?\s+de\s+investigacion",
+    "p_valor": r"p\s*[<=>]\s*0\.\d+",
+    "cronbach_valor": r"(cronbach|α|alfa|alpha)\s*[=:]\s*0\.\d+",
+    "spearman_valor": r"(spearman|ρ|rho).{0,12}[=]\s*[-+]?\d*\.?\d+",
+}
+
+RUBRIC_KEYWORDS = [k for name, kws in list(globals().items()) if name.startswith("KW_") for k in kws]
+
+@lru_cache(maxsize=None)
+def rubric_matcher() -> KeywordMatcher:
+    """Se compila en la primera corrección y se reutiliza en todo el proceso."""
+    return KeywordMatcher(RUBRIC_KEYWORDS, RUBRIC_PATTERNS, normalize=fold)
+
+@lru_cache(maxsize=None)
+def features_version() -> str:
+    """FEATURES_VERSION más una huella de las palabras clave y patrones de las rúbricas."""
+    huella = json.dumps([sorted(rubric_matcher().keywords), sorted(RUBRIC_PATTERNS.items())], ensure_ascii=False)
+    return f"{FEATURES_VERSION}-{hashlib.sha1(huella.encode('utf-8')).hexdigest()[:12]}"
+
+# ---------------------------------
+# Utilidades de evaluación
+# ---------------------------------
+def count_in_text(patterns, hits):
+    return sum(1 for p in patterns if p in hits)
+
+def has_bibliography_section(hits, refs: CitationReport):
+    return bool(refs.referencias) or refs.seccion or hits.any(KW_BIBLIOGRAFIA)
+
+def _citas_sin_referencia(refs: CitationReport, mostrar=3) -> str:
+    if not refs.sin_referencia or not refs.referencias:
+        return ""
+    ejemplos = "; ".join(refs.sin_referencia[:mostrar])
+    resto = len(refs.sin_referencia) - mostrar
+    return f" Citas sin entrada en la lista: {ejemplos}" + (f" y {resto} más" if resto > 0 else "") + "."
+
+def find_headings_docx(styles):
+    """Cuenta títulos por estilo en DOCX."""
+    h1 = sum(1 for s in styles if "Heading 1" in s or "Título 1" in s)
+    h2 = sum(1 for s in styles if "Heading 2" in s or "Título 2" in s)
+    h3 = sum(1 for s in styles if "Heading 3" in s or "Título 3" in s)
+    return h1, h2, h3
+
+def has_toc(hits, paragraphs, filetype):
+    """Detecta indicios de Tabla de contenido/Índice."""
+    if hits.any(KW_TOC):
+        return True
+    if filetype == "docx":
+        if any("Table of Contents" in p or "Contents" in p for p in paragraphs):
+            return True
+    return False
+
+def truncation_notice(doc) -> str:
+    """Aviso para el alumno/docente cuando el documento no se leyó completo."""
+    if not doc.truncated:
+        return ""
+    return (f"El archivo no se leyó completo ({doc.truncation_reason}); "
+            "la nota se calculó solo con el texto extraído.")
+
+def build_feedback_message(num, score, breakdown, summary, aviso=""):
+    lines = []
+    lines.append("Resultado de la corrección automática:\n")
+    lines.append(f"{PRACTICO_LABELS[num]}")
+    lines.append(f"Puntaje: {score}/{RUBRIC_MAX[num]}\n")
+    lines.append("Desglose por criterios:")
+    for name, got, mx, expl in breakdown:
+        lines.append(f" - {name}: {got}/{mx}. {expl}")
+    lines.append("\nComentarios generales:")
+    lines.append(summary if summary else "—")
+    if aviso:
+        lines.append(f"\nAviso: {aviso}")
+    return "\n".join(lines)
+
+# ---------------------------------
+# Rasgos del documento
+# ---------------------------------
+class DocumentFeatures:
+    """Todo lo que miran las rúbricas, extraído una sola vez por documento."""
+    __slots__ = ("filetype", "hits", "citas", "referencias", "palabras", "headings", "caps_headings", "toc")
+
+    def __init__(self, filetype, hits, citas, referencias, palabras, headings, caps_headings, toc):
+        self.filetype = filetype
+        self.hits = hits
+        self.citas = citas
+        self.referencias = referencias
+        self.palabras = palabras
+        self.headings = headings
+        self.caps_headings = caps_headings
+        self.toc = toc
+
+    # ---- serialización (result_store.py guarda los rasgos de cada entrega) ----
+    def to_dict(self) -> dict:
+        d = {name: getattr(self, name) for name in self.__slots__}
+        d["hits"], d["referencias"] = self.hits.to_dict(), self.referencias.to_dict()
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        """Solo para rasgos extraídos con la misma features_version()."""
+        return cls(**{**d, "hits": KeywordHits.from_dict(d["hits"], rubric_matcher().vocabulary),
+                      "referencias": CitationReport.from_dict(d["referencias"]), "headings": tuple(d["headings"])})
+
+def extract_features(doc: ParsedDocument) -> DocumentFeatures:
+    hits = rubric_matcher().scan(doc.folded)
+    # En PDF cada párrafo es un renglón: una referencia puede ocupar varios.
+    refs = scan_citations(doc.paragraphs, continuation=doc.filetype == "pdf")
+    return DocumentFeatures(
+        filetype=doc.filetype,
+        hits=hits,
+        citas=len(refs.citas),
+        referencias=refs,
+        palabras=doc.word_count,
+        headings=find_headings_docx(doc.styles) if doc.filetype == "docx" else (0, 0, 0),
+        caps_headings=len(re.findall(r"(?:\A|\n)[A-ZÁÉÍÓÚÑ ]{6,}(?:\n|\Z)", doc.text)) if doc.filetype != "docx" else 0,
+        toc=has_toc(hits, doc.paragraphs, doc.filetype),
+    )
+
+# ---------------------------------
+# Rúbricas por práctico
+# ---------------------------------
+def corregir_practico_1(f):
+    h = f.hits; total = 0; bd = []
+    # Tema y Título (20)
+    found = count_in_text(KW_TEMA_TITULO, h)
+    if found >= 2: pts, expl = 20, "Se identificaron 'Tema' y 'Título'."
+    elif found == 1: pts, expl = 10, "Solo se encontró uno (Tema o Título)."
+    else: pts, expl = 0, "No se detectaron secciones claras de 'Tema' y 'Título'."
+    total += pts; bd.append(("Tema y Título", pts, 20, expl))
+    # Paradigma (15)
+    pts = 15 if "paradigma" in h else 0
+    total += pts; bd.append(("Paradigma", pts, 15, "Incluye el paradigma de investigación." if pts else "No se encontró el apartado de paradigma."))
+    # Pregunta (20)
+    pts = 20 if h.patterns["pregunta_investigacion"] else 0
+    total += pts; bd.append(("Pregunta de investigación", pts, 20, "Incluye pregunta de investigación." if pts else "No se detectó una pregunta explícita."))
+    # Objetivos (30)
+    has_general = h.any(KW_OBJ_GENERAL)
+    has_especificos = h.any(KW_OBJ_ESPECIFICOS)
+    if has_general and has_especificos: pts, expl = 30, "Incluye objetivo general/principal y objetivos específicos."
+    elif has_general or has_especificos: pts, expl = 15, "Solo se encontró uno (general/principal o específicos)."
+    else: pts, expl = 0, "No se detectaron objetivos claros."
+    total += pts; bd.append(("Objetivos", pts, 30, expl))
+    # Hipótesis (15)
+    if h.any(KW_HIPOTESIS): pts, expl = 15, "Incluye hipótesis de investigación."
+    else: pts, expl = 10, "Sin hipótesis explícita; se asume diseño que no la requiere."
+    total += pts; bd.append(("Hipótesis (si corresponde)", pts, 15, expl))
+    return total, bd, "Se evaluó la presencia de secciones fundamentales de un anteproyecto."
+
+def corregir_practico_2(f):
+    h = f.hits; total = 0; bd = []
+    # Operacionalización (45)
+    found = count_in_text(KW_OPERACIONALIZACION, h)
+    if found >= 7: pts, expl = 45, "Se identifican los campos centrales del cuadro."
+    elif found >= 4: pts, expl = 30, "Cuadro parcialmente completo."
+    else: pts, expl = 10, "No se reconoce un cuadro completo."
+    total += pts; bd.append(("Cuadro de operacionalización", pts, 45, expl))
+    # Métodos (25)
+    hits = count_in_text(KW_METODOS_ANALISIS, h)
+    if hits >= 3: pts, expl = 25, "Describe métodos de análisis y su pertinencia."
+    elif hits >= 1: pts, expl = 15, "Menciona métodos con poco detalle."
+    else: pts, expl = 5, "No especifica métodos de análisis."
+    total += pts; bd.append(("Métodos de análisis", pts, 25, expl))
+    # Validación (20)
+    hits = count_in_text(KW_VALIDACION, h)
+    if hits >= 2: pts, expl = 20, "Estrategias de validación para datos/instrumentos."
+    elif hits == 1: pts, expl = 10, "Menciona validación de forma breve."
+    else: pts, expl = 0, "No indica cómo validará datos/instrumentos."
+    total += pts; bd.append(("Validación de datos/instrumentos", pts, 20, expl))
+    # Ética (10)
+    pts = 10 if h.any(KW_ETICA) else 0
+    total += pts; bd.append(("Ética", pts, 10, "Incluye consideraciones éticas." if pts else "No se describen consideraciones éticas."))
+    return total, bd, "Se verificó cuadro de variables, pertinencia de métodos, validación y ética."
+
+def corregir_practico_3(f):
+    h = f.hits; total = 0; bd = []
+    # Muestreo (30)
+    hits = count_in_text(KW_MUESTREO, h)
+    if hits >= 2 and h.any(KW_FUNDAMENTACION):
+        pts, expl = 30, "Describe el muestreo y fundamenta la elección."
+    elif hits >= 1:
+        pts, expl = 20, "Menciona el tipo de muestreo con poca justificación."
+    else:
+        pts, expl = 10, "No se identifica claramente el muestreo."
+    total += pts; bd.append(("Tipo de muestreo y justificación", pts, 30, expl))
+    # Instrumentos (25)
+    hits = count_in_text(KW_INSTRUMENTOS, h)
+    if hits >= 2: pts, expl = 25, "Selecciona instrumentos y explica su adecuación."
+    elif hits == 1: pts, expl = 15, "Menciona un instrumento sin suficiente justificación."
+    else: pts, expl = 5, "No define instrumentos de recolección."
+    total += pts; bd.append(("Instrumentos y adecuación", pts, 25, expl))
+    # Validez/fiabilidad (20)
+    hits = count_in_text(KW_VALIDEZ_FIABILIDAD, h)
+    if hits >= 2: pts, expl = 20, "Incluye procedimientos para validez/fiabilidad."
+    elif hits == 1: pts, expl = 10, "Menciona brevemente validez/fiabilidad."
+    else: pts, expl = 0, "No aborda validez/fiabilidad."
+    total += pts; bd.append(("Validez/fiabilidad de instrumentos", pts, 20, expl))
+    # Tamaño muestral (25)
+    hits = count_in_text(KW_TAMANO_MUESTRA, h)
+    if hits >= 2: pts, expl = 25, "Estima tamaño de muestra y fundamenta (error/confianza/supuestos)."
+    elif hits == 1: pts, expl = 15, "Menciona el tamaño sin fundamento claro."
+    else: pts, expl = 5, "No calcula ni fundamenta el tamaño muestral."
+    total += pts; bd.append(("Tamaño de la muestra", pts, 25, expl))
+    return total, bd, "Se revisaron muestreo, instrumentos, validez y tamaño muestral."
+
+def corregir_practico_4(f):
+    """Se espera ~500 palabras EN TOTAL para Introducción+Marco (±10%). ≥3 citas, mención de IA y bibliografía."""
+    h = f.hits; total = 0; bd = []
+    total_words = f.palabras
+    # Extensión total
+    if "introducción" in h and "marco teórico" in h:
+        pts = 20 if 450 <= total_words <= 550 else (10 if 350 <= total_words <= 650 else 0)
+        expl = f"Extensión total {total_words} palabras (objetivo ~500)."
+    else:
+        pts = 10 if 450 <= total_words <= 550 else 0
+        expl = "No se detectaron ambos títulos; se evaluó por extensión total."
+    total += pts; bd.append(("Extensión total (Intro+Marco)", pts, 20, expl))
+    # Citas
+    citas = f.citas
+    if citas >= 3: pts, expl = 30, f"Se detectaron {citas} citas (mínimo 3)."
+    elif citas == 2: pts, expl = 20, "Solo se detectaron 2 citas."
+    elif citas == 1: pts, expl = 10, "Solo se detectó 1 cita."
+    else: pts, expl = 0, "No se detectaron citas (Apellido, Año)."
+    total += pts; bd.append(("Citas en el texto", pts, 30, expl))
+    # IA
+    pts = 15 if h.any(KW_IA) else 5
+    total += pts; bd.append(("Uso de IA (mención)", pts, 15, "Se menciona uso de IA." if pts == 15 else "No se menciona explícitamente apoyo de IA."))
+    # Bibliografía
+    pts = 15 if has_bibliography_section(h, f.referencias) else 0
+    total += pts; bd.append(("Referencias/Bibliografía", pts, 15, "Incluye bibliografía." + _citas_sin_referencia(f.referencias) if pts else "No se detectó sección de bibliografía."))
+    return total, bd, "Se evaluó extensión total (~500), citas, mención de IA y bibliografía."
+
+def corregir_practico_5(f):
+    h = f.hits; total = 0; bd = []
+    citas = f.citas
+    if citas >= 5: pts, expl = 35, f"Se detectaron {citas} citas (mínimo 5)."
+    elif citas >= 3: pts, expl = 20, f"Solo {citas} citas; se requieren 5."
+    elif citas >= 1: pts, expl = 10, "Muy pocas citas."
+    else: pts, expl = 0, "No se detectaron citas."
+    total += pts; bd.append(("Citas en el texto", pts, 35, expl))
+    refs = f.referencias
+    pts = 30 if has_bibliography_section(h, refs) else 10
+    total += pts; bd.append(("Bibliografía final", pts, 30, "Incluye bibliografía generada." if pts == 30 else "No se detecta bibliografía clara."))
+    # Consistencia: entradas con autor, año y título, y cada cita con su referencia.
+    entradas = len(refs.referencias)
+    bien_formadas = sum(1 for _, anio, titulo, _, _ in refs.referencias if anio and titulo)
+    citadas_ok = len(refs.citas) - sum(1 for a, y in refs.citas if f"{a}, {y}" in refs.sin_referencia)
+    if entradas and bien_formadas == entradas and citadas_ok >= 0.8 * len(refs.citas):
+        pts, expl = 20, f"{entradas} referencias con autor, año y título ({refs.completas()} con DOI/URL)."
+    elif entradas:
+        pts, expl = 10, f"{bien_formadas} de {entradas} referencias con formato completo."
+    else:
+        pts, expl = 10, "No se pudieron leer entradas de la lista de referencias (Apellido, I. (Año). Título)."
+    expl += _citas_sin_referencia(refs)
+    total += pts; bd.append(("Consistencia de formato", pts, 20, expl))
+    pts = 15 if h.any(KW_MENDELEY) else 5
+    total += pts; bd.append(("Organización/metadatos", pts, 15, "Evidencia organización/corrección de metadatos." if pts == 15 else "No se menciona organización/metadatos."))
+    return total, bd, "Se verificaron citas, bibliografía final y consistencia general de referencias."
+
+def corregir_practico_6(f):
+    h = f.hits; total = 0; bd = []
+    if f.filetype == "docx":
+        h1,h2,h3 = f.headings
+        if h1>=1 and h2>=1 and h3>=1: pts, expl = 50, f"Jerarquía correcta: H1={h1}, H2={h2}, H3={h3}."
+        elif (h1>=1 and h2>=1) or (h1>=1 and h3>=1): pts, expl = 35, f"Faltan algunos niveles: H1={h1}, H2={h2}, H3={h3}."
+        else: pts, expl = 15, f"Escasa jerarquía: H1={h1}, H2={h2}, H3={h3}."
+    else:
+        caps = f.caps_headings
+        pts, expl = (35, "Jerarquías aproximadas en PDF.") if caps>=3 else ((20, "Jerarquía mínima en PDF.") if caps>=1 else (10, "No se reconoce jerarquía en PDF."))
+    total += pts; bd.append(("Títulos jerarquizados", pts, 50, expl))
+    toc = f.toc
+    pts, expl = (40, "Se detecta tabla de contenido/índice.") if toc else (15, "No se detecta índice automático.")
+    total += pts; bd.append(("Tabla de contenido", pts, 40, expl))
+    pts = 10 if h.any(KW_ACTUALIZAR_INDICE) else 5
+    total += pts; bd.append(("Actualización del índice (mención)", pts, 10, "Menciona la actualización del índice." if pts==10 else "No se menciona actualización."))
+    return total, bd, "Se evaluó estructura por niveles y presencia de índice automático."
+
+def corregir_practico_7(f):
+    """Cuantitativo: descriptivas, p-value/Mann-Whitney, Cronbach, Spearman o clúster (25 c/u)."""
+    h = f.hits; total = 0; bd = []
+    desc_hits = count_in_text(KW_DESCRIPTIVAS, h)
+    if desc_hits>=4: pts, expl = 25, "Incluye media, mediana, moda y desvío estándar."
+    elif desc_hits>=2: pts, expl = 15, "Incluye parte de las medidas descriptivas."
+    elif desc_hits>=1: pts, expl = 8, "Menciona al menos una medida."
+    else: pts, expl = 0, "No se reconocen medidas descriptivas."
+    total += pts; bd.append(("Medidas descriptivas", pts, 25, expl))
+    has_p = bool(h.patterns["p_valor"])
+    has_mw = h.any(KW_MANN_WHITNEY)
+    if has_p and has_mw: pts, expl = 25, "Reporta p-value y menciona Mann-Whitney."
+    elif has_p or has_mw: pts, expl = 18, "Menciona prueba de significancia (p-value o Mann-Whitney)."
+    else: pts, expl = 6, "No se evidencia prueba de significancia."
+    total += pts; bd.append(("Significancia / Mann-Whitney", pts, 25, expl))
+    has_cron = h.any(KW_CRONBACH)
+    cron_value = bool(h.patterns["cronbach_valor"])
+    if cron_value: pts, expl = 25, "Informa alfa de Cronbach con valor."
+    elif has_cron: pts, expl = 15, "Menciona alfa de Cronbach sin valor."
+    else: pts, expl = 5, "No se reconoce evaluación de confiabilidad."
+    total += pts; bd.append(("Confiabilidad (Cronbach)", pts, 25, expl))
+    has_spear = h.any(KW_SPEARMAN)
+    spear_value = bool(h.patterns["spearman_valor"])
+    has_cluster = h.any(KW_CLUSTER)
+    if spear_value or has_cluster: pts, expl = 25, "Presenta correlación de Spearman (con valor) o análisis de clúster."
+    elif has_spear: pts, expl = 15, "Menciona Spearman sin valor."
+    else: pts, expl = 8, "No se reconoce correlación ni clúster."
+    total += pts; bd.append(("Relación entre variables", pts, 25, expl))
+    return total, bd, "Se verificaron descriptivas, significancia/Mann-Whitney, Cronbach y relación (Spearman/clúster)."
+
+def corregir_practico_8(f):
+    """Cualitativo: temático (30), sentimiento (25), discurso (25), interpretación MMH vs Medicina Social (20)."""
+    h = f.hits; total = 0; bd = []
+    has_tema = "análisis temático" in h or ("temas" in h and "subtemas" in h)
+    if has_tema and h.any(["subtema", "subtemas"]): pts, expl = 30, "Identifica temas y subtemas con evidencia."
+    elif has_tema: pts, expl = 20, "Menciona análisis temático de forma general."
+    else: pts, expl = 8, "No se reconoce análisis temático."
+    total += pts; bd.append(("Análisis temático", pts, 30, expl))
+    sent_hits = count_in_text(KW_SENTIMIENTO, h)
+    if sent_hits>=3: pts, expl = 25, "Clasifica sentimientos con ejemplos."
+    elif sent_hits>=1: pts, expl = 15, "Menciona sentimiento de forma parcial."
+    else: pts, expl = 6, "No se reconoce análisis de sentimiento."
+    total += pts; bd.append(("Análisis de sentimiento", pts, 25, expl))
+    disco_hits = count_in_text(KW_DISCURSO, h)
+    if disco_hits>=3: pts, expl = 25, "Analiza funciones del discurso, complejidad y relaciones de poder/posicionamientos."
+    elif disco_hits>=1: pts, expl = 15, "Aborda el discurso parcialmente."
+    else: pts, expl = 6, "No se reconoce análisis del discurso."
+    total += pts; bd.append(("Análisis del discurso", pts, 25, expl))
+    has_mmh = h.any(KW_MMH)
+    has_ms = "medicina social" in h
+    if has_mmh and has_ms: pts, expl = 20, "Interpreta resultados vinculándolos con MMH y Medicina Social."
+    elif has_mmh or has_ms: pts, expl = 12, "Refiere a MMH o Medicina Social, sin contraste claro."
+    else: pts, expl = 6, "No vincula la interpretación con MMH/Medicina Social."
+    total += pts; bd.append(("Interpretación (MMH vs Medicina Social)", pts, 20, expl))
+    return total, bd, "Se revisó temático, sentimiento, discurso e interpretación MMH vs Medicina Social."
+
+# ---------------------------------
+# Router de evaluación
+# ---------------------------------
+def evaluar_practico(num, doc: ParsedDocument):
+    return evaluar_features(num, extract_features(doc))
+
+def evaluar_features(num, f):
+    if num == 1: return corregir_practico_1(f)
+    # Intercambio de lógica: 
+    # - Práctico 2 debe evaluar muestreo, instrumentos, validación y tamaño muestral
+    # - Práctico 3 debe evaluar operacionalización y métodos de análisis
+    if num == 2: return corregir_practico_3(f)
+    if num == 3: return corregir_practico_2(f)
+    if num == 4: return corregir_practico_4(f)
+    if num == 5: return corregir_practico_5(f)
+    if num == 6: return corregir_practico_6(f)
+    if num == 7: return corregir_practico_7(f)
+    if num == 8: return corregir_practico_8(f)
+    return 0, [], "—"
+
+# Detección del práctico: otro práctico "encaja claramente mejor" si supera al
+# elegido por DETECCION_MARGEN puntos (sobre 100) y alcanza DETECCION_MINIMO.
+DETECCION_MARGEN = 20
+DETECCION_MINIMO = 60
+
+def evaluar_todos(f) -> dict:
+    """Puntaje normalizado (0-100) de las ocho rúbricas sobre los mismos rasgos."""
+    return {num: round(100 * evaluar_features(num, f)[0] / RUBRIC_MAX[num]) for num in PRACTICO_LABELS}
+
+def detectar_practico(f, seleccionado):
+    """Devuelve (num, puntajes) si otro práctico encaja claramente mejor, o (None, puntajes)."""
+    puntajes = evaluar_todos(f)
+    mejor = max((n for n in puntajes if n != seleccionado), key=puntajes.get)
+    if puntajes[mejor] >= DETECCION_MINIMO and puntajes[mejor] - puntajes[seleccionado] >= DETECCION_MARGEN:
+        return mejor, puntajes
+    return None, puntajes
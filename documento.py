@@ -0,0 +1,92 @@
+"""Modelo normalizado de un documento entregado.
+
+Los lectores (read_docx/read_pdf) construyen un ParsedDocument una sola vez;
+las rúbricas trabajan sobre sus vistas sin volver a copiar el texto:
+
+- `text`: texto original (NFC);
+- `folded`: minúsculas sin tildes ni diéresis. No tiene por qué medir lo mismo que
+  `text` (se quitan las marcas combinantes sueltas y 'İ' en minúscula son dos
+  caracteres): sus posiciones no se corresponden con las de `text`;
+- `tokens`: offsets (inicio, fin) de cada palabra dentro de `folded`, calculados
+  recién la primera vez que se piden (solo los usa near_duplicates);
+- `paragraphs` / `styles`: listas paralelas con el texto y el estilo de cada párrafo.
+"""
+import re
+import unicodedata
+from array import array
+from itertools import chain
+
+
+def _build_fold_table():
+    table = {}
+    # Latin-1 y Latin Extended-A cubren las letras acentuadas del español (y más).
+    for cp in range(0xC0, 0x250):
+        base = unicodedata.normalize("NFD", chr(cp))[0]
+        if base != chr(cp) and base.isascii():
+            table[cp] = base
+    # Marcas combinantes sueltas (texto que no venía en NFC).
+    for cp in range(0x300, 0x370):
+        table[cp] = None
+    return table
+
+FOLD_TABLE = _build_fold_table()
+_WORD = re.compile(r"\w+")
+
+
+def fold(text: str) -> str:
+    """Minúsculas sin tildes: 'Hipótesis' → 'hipotesis'. Conserva ñ→n, α, ρ, º."""
+    return text.lower().translate(FOLD_TABLE)
+
+
+class ParsedDocument:
+    __slots__ = ("text", "folded", "_tokens", "word_count", "paragraphs", "styles", "filetype",
+                 "pages", "total_pages", "truncated", "truncation_reason")
+
+    def __init__(self, text, paragraphs, styles, filetype,
+                 pages=None, total_pages=None, truncated=False, truncation_reason=""):
+        self.text = unicodedata.normalize("NFC", text)
+        self.folded = fold(self.text)
+        self._tokens = None
+        self.word_count = sum(1 for _ in _WORD.finditer(self.folded))
+        self.paragraphs = paragraphs
+        self.styles = styles
+        self.filetype = filetype
+        self.pages = pages
+        self.total_pages = total_pages
+        self.truncated = truncated
+        self.truncation_reason = truncation_reason
+
+    @classmethod
+    def empty(cls, filetype="unknown"):
+        return cls("", [], [], filetype)
+
+    @property
+    def tokens(self) -> array:
+        if self._tokens is None:
+            self._tokens = array("I", chain.from_iterable(map(re.Match.span, _WORD.finditer(self.folded))))
+        return self._tokens
+
+    def token(self, i) -> str:
+        return self.folded[self.tokens[2 * i]:self.tokens[2 * i + 1]]
+
+    def size(self) -> int:
+        """Tamaño aproximado en caracteres (para la caché)."""
+        return 2 * len(self.text) + sum(map(len, self.paragraphs)) + sum(map(len, self.styles))
+
+    # ---- serialización (caché en disco, almacenamiento) ----
+    def to_dict(self) -> dict:
+        return {
+            "plain_text": self.text,
+            "paragraphs": self.paragraphs,
+            "styles": self.styles,
+            "filetype": self.filetype,
+            "pages": self.pages,
+            "total_pages": self.total_pages,
+            "truncated": self.truncated,
+            "truncation_reason": self.truncation_reason,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(d["plain_text"], d["paragraphs"], d["styles"], d["filetype"],
+                   d.get("pages"), d.get("total_pages"), d.get("truncated", False), d.get("truncation_reason", ""))
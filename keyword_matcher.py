@@ -0,0 +1,108 @@
+"""Detector de palabras clave en una sola pasada.
+
+Todas las palabras clave de las rúbricas se compilan una vez en una única
+expresión regular con forma de trie, que reconoce la clave más larga en cada
+posición. Las claves contenidas en una coincidencia (p. ej. "ia" dentro de
+"media") se agregan por clausura, y las que empiezan dentro de una coincidencia
+y terminan después de ella se prueban con un `match` anclado. El resultado
+equivale a evaluar `k in texto` para cada clave, recorriendo el documento una
+sola vez.
+"""
+import re
+
+
+def _trie_regex(keywords) -> str:
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        terminal = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Greedy: intenta primero la clave más larga y retrocede a la actual.
+            body = "(?:" + body + ")?" if len(branches) == 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+class KeywordHits:
+    """Resultado de `KeywordMatcher.scan`: claves presentes y conteo de patrones."""
+    __slots__ = ("keywords", "patterns", "vocabulary")
+
+    def __init__(self, keywords, patterns, vocabulary):
+        self.keywords = keywords
+        self.patterns = patterns
+        self.vocabulary = vocabulary
+
+    def __contains__(self, keyword):
+        # Una clave no registrada en el matcher daría siempre False en silencio.
+        try:
+            return self.vocabulary[keyword] in self.keywords
+        except KeyError:
+            raise KeyError(f"Palabra clave no registrada en el matcher: {keyword!r}") from None
+
+    def any(self, keywords):
+        return any(k in self for k in keywords)
+
+    def to_dict(self) -> dict:
+        return {"keywords": sorted(self.keywords), "patterns": self.patterns}
+
+    @classmethod
+    def from_dict(cls, d, vocabulary):
+        """`vocabulary` es el del matcher actual; las claves guardadas deben ser de la misma versión."""
+        return cls(frozenset(d["keywords"]), dict(d["patterns"]), vocabulary)
+
+
+class KeywordMatcher:
+    """`normalize` se aplica a las claves (p. ej. quitar tildes); el texto que
+    recibe scan() ya debe venir normalizado de la misma forma."""
+
+    def __init__(self, keywords, patterns=None, normalize=None):
+        normalize = normalize or (lambda k: k)
+        # Clave tal como la escriben las rúbricas → forma normalizada.
+        self.vocabulary = {k: normalize(k) for k in keywords}
+        self.keywords = frozenset(self.vocabulary.values())
+        self._regex = re.compile(_trie_regex(self.keywords))
+        self._contained = {
+            k: frozenset(o for o in self.keywords if o in k) for k in self.keywords
+        }
+        # Desplazamientos dentro de cada clave donde puede empezar otra clave
+        # que termine después de ella (su sufijo es prefijo propio de otra).
+        self._cross = {
+            k: tuple(
+                i for i in range(1, len(k))
+                if any(len(o) > len(k) - i and o.startswith(k[i:]) for o in self.keywords)
+            )
+            for k in self.keywords
+        }
+        # Patrones que no son literales (p. ej. "p < 0.05"): se compilan una vez
+        # y se cuentan en la misma llamada a scan().
+        self._patterns = {name: re.compile(p) for name, p in (patterns or {}).items()}
+
+    def scan(self, text_lower: str) -> KeywordHits:
+        found = set()
+        contained = self._contained
+        cross = self._cross
+        anchored = self._regex.match
+        for m in self._regex.finditer(text_lower):
+            kw = m.group()
+            if kw not in found:
+                found |= contained[kw]
+            # Claves que se solapan con el final de esta coincidencia.
+            start, end = m.span()
+            for offset in cross[kw]:
+                m2 = anchored(text_lower, start + offset)
+                if m2 and m2.end() > end and m2.group() not in found:
+                    found |= contained[m2.group()]
+        patterns = {
+            name: sum(1 for _ in rx.finditer(text_lower)) for name, rx in self._patterns.items()
+        }
+        return KeywordHits(found, patterns, self.vocabulary)
@@ -0,0 +1,233 @@
+"""Métricas en proceso: histogramas, contadores y volcado en formato Prometheus.
+
+El registro es global al proceso (sobrevive a las re-ejecuciones de Streamlit
+porque el módulo queda importado). Cada corrección genera además una línea de
+log JSON con la duración de cada etapa, el tamaño, las páginas y el tipo de
+archivo (logger "metrics"; `configure_log` le agrega el handler, a stderr o a
+un archivo, porque Streamlit no configura el logging raíz).
+
+    trace = GradingTrace()
+    with trace.stage("parse_file"):
+        ...
+    trace.file_bytes = len(data)
+    trace.finish(filetype="pdf", pages=12, practico=4)
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger("metrics")
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(10_000 * 2 ** i for i in range(13))  # 10 KB … ~40 MB
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+STAGES = ("upload_read", "admision", "cola_parseo", "parse_file", "evaluar_practico", "similitud",
+          "guardar_rasgos", "build_feedback_message", "enviar_email")
+
+
+def configure_log(path=None):
+    """Deja el logger "metrics" en INFO con su propio handler (stderr o `path`).
+
+    Sin esto las líneas JSON se descartan: el nivel efectivo del logger raíz es
+    WARNING. Es idempotente y no propaga, para no duplicar líneas si otro
+    componente configura el logging raíz.
+    """
+    if not any(getattr(h, "_metrics", False) for h in log.handlers):
+        handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler._metrics = True
+        log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    return log
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=TIME_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [counts por bucket (+Inf al final), suma, cantidad]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+    def quantile(self, q, counts, total):
+        """Cuantil aproximado por interpolación lineal dentro del bucket."""
+        if not total:
+            return None
+        rank, seen, lower = q * total, 0, 0.0
+        for upper, count in zip(self.buckets + (float("inf"),), counts):
+            if seen + count >= rank and count:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total_sum, n) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for upper, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{upper}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total_sum}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # funciones que devuelven [(nombre, help, valor)] como gauges
+
+    def counter(self, *args, **kwargs):
+        m = Counter(*args, **kwargs)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, *args, **kwargs):
+        m = Histogram(*args, **kwargs)
+        self.metrics.append(m)
+        return m
+
+    def register_collector(self, fn):
+        self.collectors.append(fn)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        for fn in self.collectors:
+            for name, help, value in fn():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "grading_stage_seconds", "Duración de cada etapa de la corrección", ("stage", "filetype"))
+UPLOAD_BYTES = REGISTRY.histogram(
+    "grading_upload_bytes", "Tamaño de los archivos subidos", ("filetype",), buckets=SIZE_BUCKETS)
+DOCUMENT_PAGES = REGISTRY.histogram(
+    "grading_document_pages", "Páginas leídas por documento (PDF)", ("filetype",), buckets=PAGE_BUCKETS)
+GRADINGS = REGISTRY.counter("gradings_total", "Correcciones realizadas", ("practico", "filetype"))
+ADMISSION_REJECTED = REGISTRY.counter("admission_rejected_total", "Entregas rechazadas antes de parsear", ("motivo",))
+EMAIL_DELIVERY_SECONDS = REGISTRY.histogram(
+    "email_delivery_seconds", "Entrega de un correo desde la bandeja de salida", ("resultado",))
+
+
+class GradingTrace:
+    """Acumula las duraciones de una corrección y las publica al terminar."""
+
+    def __init__(self):
+        self.durations = {}
+        self.file_bytes = None
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - t0
+
+    def finish(self, filetype="", pages=None, **fields):
+        file_bytes = self.file_bytes
+        for name, seconds in self.durations.items():
+            STAGE_SECONDS.observe(seconds, stage=name, filetype=filetype)
+        if file_bytes is not None:
+            UPLOAD_BYTES.observe(file_bytes, filetype=filetype)
+        if pages:
+            DOCUMENT_PAGES.observe(pages, filetype=filetype)
+        if "practico" in fields:
+            GRADINGS.inc(practico=fields["practico"], filetype=filetype)
+        record = {"event": "grading", "filetype": filetype, "file_bytes": file_bytes, "pages": pages,
+                  **fields, "stages_ms": {k: round(v * 1000, 2) for k, v in self.durations.items()}}
+        log.info(json.dumps(record, ensure_ascii=False))
+        return record
+
+
+def stage_summary(registry_hist=STAGE_SECONDS):
+    """Filas (etapa, tipo, n, media, p50, p95) para el panel de administración."""
+    order = {name: i for i, name in enumerate(STAGES)}
+    rows = []
+    series = sorted(registry_hist.snapshot().items(), key=lambda kv: (order.get(kv[0][0], len(order)), kv[0]))
+    for (stage, filetype), (counts, total_sum, n) in series:
+        rows.append({
+            "etapa": stage, "tipo": filetype, "n": n,
+            "media_ms": round(1000 * total_sum / n, 1),
+            "p50_ms": round(1000 * registry_hist.quantile(0.5, counts, n), 1),
+            "p95_ms": round(1000 * registry_hist.quantile(0.95, counts, n), 1),
+        })
+    return rows
+
+
+# ---------------------------------
+# Exposición para Prometheus
+# ---------------------------------
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Sirve /metrics en un hilo aparte (solo en localhost por defecto)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,216 @@
+"""Detección de entregas casi idénticas (MinHash + LSH) persistida en SQLite.
+
+Cada documento se reduce a su conjunto de shingles (SHINGLE_WORDS palabras
+consecutivas del texto sin tildes) y a una firma MinHash de NUM_PERM valores:
+la fracción de valores iguales entre dos firmas estima la similitud de
+Jaccard entre los documentos. La firma se parte en BANDS bandas; dos
+documentos son candidatos si coinciden en alguna banda completa, lo que se
+resuelve con un índice (clave de banda → documento) sin recorrer todas las
+entregas anteriores. Con 32 bandas de 4 filas, pares con Jaccard ≈ 0,42 ya
+tienen un 50 % de probabilidad de ser candidatos y los de 0,6 más del 98 %.
+
+El índice se actualiza con cada corrección y las coincidencias se muestran
+solo en la vista docente (nunca en el correo al alumno).
+"""
+import hashlib
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from documento import fold, _WORD
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+# Textos con menos shingles que esto (carátulas, archivos vacíos) no se indexan.
+MIN_SHINGLES = 20
+# Por debajo de esto pesan más los títulos y consignas comunes a todas las entregas.
+SIMILARITY_MIN = 0.5
+MAX_CANDIDATES = 1000
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(20240601)
+# Permutaciones h(x) = (a·x + b) mod p, con a, b < 2^32 para que a·x no desborde uint64.
+_PERM_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)[:, None]
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)[:, None]
+
+
+def shingle_hashes(folded: str, tokens=None) -> np.ndarray:
+    """Hashes (32 bits, sin repetir) de cada secuencia de SHINGLE_WORDS palabras."""
+    if tokens is None:
+        words = _WORD.findall(folded)
+    else:
+        words = [folded[s:e] for s, e in zip(tokens[::2], tokens[1::2])]
+    n = len(words) - SHINGLE_WORDS + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64)
+    ids = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(SHINGLE_WORDS):
+        h = (h * np.uint64(1000003) + ids[j:j + n]) & _MAX_HASH
+    return np.unique(h)
+
+
+def minhash(shingles: np.ndarray, chunk=2048) -> np.ndarray:
+    sig = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(shingles), chunk):
+        block = shingles[None, start:start + chunk]
+        np.minimum(sig, (((_PERM_A * block + _PERM_B) % _MERSENNE) & _MAX_HASH).min(axis=1), out=sig)
+    return sig.astype("<u4")
+
+
+def signature(doc) -> bytes:
+    """Firma MinHash de un ParsedDocument (o None si el texto es demasiado corto)."""
+    shingles = shingle_hashes(doc.folded, doc.tokens)
+    return minhash(shingles).tobytes() if len(shingles) >= MIN_SHINGLES else None
+
+
+def signature_from_text(text: str) -> bytes:
+    shingles = shingle_hashes(fold(text))
+    return minhash(shingles).tobytes() if len(shingles) >= MIN_SHINGLES else None
+
+
+def band_keys(firma: bytes) -> list:
+    """Una clave entera (64 bits con signo, como los INTEGER de SQLite) por banda."""
+    raw = memoryview(firma)
+    step = ROWS * 4
+    return [int.from_bytes(hashlib.blake2b(bytes([i]) + raw[i * step:(i + 1) * step], digest_size=8).digest(),
+                           "little", signed=True) for i in range(BANDS)]
+
+
+def similarity(firma_a: bytes, firma_b: bytes) -> float:
+    a, b = np.frombuffer(firma_a, dtype="<u4"), np.frombuffer(firma_b, dtype="<u4")
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS similitud_documentos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL,
+    email TEXT NOT NULL,
+    practico INTEGER NOT NULL,
+    resultado INTEGER,               -- id en resultados (result_store.py)
+    firma BLOB NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS similitud_documentos_hash ON similitud_documentos (hash);
+CREATE TABLE IF NOT EXISTS similitud_bandas (
+    clave INTEGER NOT NULL,
+    doc INTEGER NOT NULL,
+    PRIMARY KEY (clave, doc)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS similitud_coincidencias (
+    doc INTEGER NOT NULL,
+    otro INTEGER NOT NULL,
+    similitud REAL NOT NULL,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS similitud_coincidencias_creado ON similitud_coincidencias (creado);
+CREATE INDEX IF NOT EXISTS similitud_coincidencias_doc ON similitud_coincidencias (doc);
+"""
+
+
+class SimilarityIndex:
+    def __init__(self, db_path, threshold=SIMILARITY_MIN):
+        self.db_path = str(db_path)
+        self.threshold = threshold
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def signature_for_hash(self, digest):
+        """Firma ya calculada para el mismo archivo (re-entregas que no se vuelven a parsear)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT firma FROM similitud_documentos WHERE hash = ? LIMIT 1", (digest,)).fetchone()
+        return None if row is None else row[0]
+
+    def _query(self, conn, firma, practico, exclude_email, k):
+        keys = band_keys(firma)
+        params = keys + [practico, exclude_email or "", MAX_CANDIDATES]
+        rows = conn.execute(
+            "SELECT id, email, practico, resultado, firma, creado FROM similitud_documentos WHERE id IN "
+            f"(SELECT doc FROM similitud_bandas WHERE clave IN ({','.join('?' * len(keys))})) "
+            "AND practico = ? AND email != ? ORDER BY id DESC LIMIT ?",
+            params,
+        ).fetchall()
+        matches = []
+        for row in rows:
+            sim = similarity(firma, row["firma"])
+            if sim >= self.threshold:
+                matches.append({"doc": row["id"], "email": row["email"], "practico": row["practico"],
+                                "resultado": row["resultado"], "creado": row["creado"], "similitud": round(sim, 3)})
+        matches.sort(key=lambda m: -m["similitud"])
+        return matches[:k]
+
+    def query(self, firma, practico, exclude_email=None, k=5) -> list:
+        """Las k entregas anteriores más parecidas (de otros alumnos, mismo práctico)."""
+        with self._connect() as conn:
+            return self._query(conn, firma, practico, exclude_email, k)
+
+    def add(self, digest, email, practico, firma=None, resultado=None, k=5):
+        """Indexa una entrega y devuelve sus coincidencias con entregas anteriores.
+
+        Si no se pasa `firma`, se reutiliza la de un archivo idéntico ya indexado;
+        sin ninguna de las dos (texto demasiado corto) no se indexa y devuelve [].
+        """
+        firma = firma or self.signature_for_hash(digest)
+        if firma is None:
+            return []
+        email = email.strip().lower()
+        now = time.time()
+        with self._connect() as conn:
+            matches = self._query(conn, firma, practico, email, k)
+            cur = conn.execute(
+                "INSERT INTO similitud_documentos (hash, email, practico, resultado, firma, creado) VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, email, practico, resultado, firma, now),
+            )
+            doc_id = cur.lastrowid
+            conn.executemany("INSERT OR IGNORE INTO similitud_bandas (clave, doc) VALUES (?, ?)",
+                             [(key, doc_id) for key in band_keys(firma)])
+            conn.executemany("INSERT INTO similitud_coincidencias (doc, otro, similitud, creado) VALUES (?, ?, ?, ?)",
+                             [(doc_id, m["doc"], m["similitud"], now) for m in matches])
+        return matches
+
+    def recent_matches(self, limit=100, min_similarity=None) -> list:
+        """Coincidencias registradas, las más recientes primero (vista docente)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT c.creado, c.similitud, d.practico, d.email AS alumno, o.email AS similar_a, "
+                "d.resultado, o.resultado AS resultado_similar "
+                "FROM similitud_coincidencias c JOIN similitud_documentos d ON d.id = c.doc "
+                "JOIN similitud_documentos o ON o.id = c.otro WHERE c.similitud >= ? "
+                "ORDER BY c.creado DESC, c.similitud DESC LIMIT ?",
+                (min_similarity if min_similarity is not None else self.threshold, limit),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def matches_for_result(self, resultado) -> list:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT c.similitud, o.email AS similar_a, o.resultado AS resultado_similar, o.creado "
+                "FROM similitud_documentos d JOIN similitud_coincidencias c ON c.doc = d.id "
+                "JOIN similitud_documentos o ON o.id = c.otro WHERE d.resultado = ? ORDER BY c.similitud DESC",
+                (resultado,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            docs = conn.execute("SELECT COUNT(*) FROM similitud_documentos").fetchone()[0]
+            pairs = conn.execute("SELECT COUNT(*) FROM similitud_coincidencias").fetchone()[0]
+        return {"documentos": docs, "coincidencias": pairs}
@@ -0,0 +1,345 @@
+"""Bandeja de salida persistente para los correos de resultados.
+
+La app solo encola el mensaje (SQLite) y responde; un hilo en segundo plano lo
+entrega con SendGrid y, si falla, por SMTP reutilizando una única conexión
+autenticada. Los errores transitorios se reintentan con backoff exponencial.
+
+Para probar sin enviar correos reales, levantar un SMTP local:
+    python -m aiosmtpd -n -l localhost:1025
+y configurar SMTP_HOST="localhost", SMTP_PORT=1025, SMTP_STARTTLS=false.
+"""
+import logging
+import smtplib
+import sqlite3
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+
+from metrics import EMAIL_DELIVERY_SECONDS
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_S = 5.0
+BACKOFF_MAX_S = 30 * 60.0
+# Tiempo que un mensaje queda reservado por el hilo que lo está enviando.
+CLAIM_LEASE_S = 300.0
+
+
+def html_body(mensaje_texto: str) -> str:
+    return (
+        "<html><body>"
+        f"<pre style='white-space:pre-wrap;font-family:inherit'>{mensaje_texto}</pre>"
+        "<hr>"
+        "<p style='font-size:12px;color:#666'>"
+        "Este correo fue enviado automáticamente por la plataforma de la cátedra. "
+        "Si no lo ves en tu bandeja de entrada, revisá <b>Correo no deseado</b> y marcá como ‘No es spam’."
+        "</p>"
+        "</body></html>"
+    )
+
+
+def _as_bool(value, default=True):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "")
+    return bool(value)
+
+
+# ---------------------------------
+# Transportes
+# ---------------------------------
+class SMTPPool:
+    """Una conexión SMTP autenticada que se reutiliza entre envíos."""
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, timeout=30):
+        self.host, self.port = host, int(port)
+        self.user, self.password = user, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.starttls:
+            server.starttls(context=ssl.create_default_context())
+            server.ehlo()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    def send(self, msg: EmailMessage):
+        with self._lock:
+            for attempt in (1, 2):
+                if self._server is None:
+                    self._server = self._connect()
+                try:
+                    self._server.send_message(msg)
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+                    # La conexión guardada pudo cerrarse por inactividad: se reabre una vez.
+                    self._discard()
+                    if attempt == 2:
+                        raise
+                    log.info("Conexión SMTP perdida (%s); reconectando", e)
+                except smtplib.SMTPException:
+                    raise  # rechazo del servidor: la conexión sigue siendo válida
+                except OSError:
+                    self._discard()
+                    raise
+
+    def _discard(self):
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+            self._server = None
+
+    def close(self):
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except Exception:
+                    pass
+                self._discard()
+
+
+class Mailer:
+    """Compone y entrega un mensaje: SendGrid primero, SMTP como respaldo."""
+
+    def __init__(self, config):
+        self.config = config
+        self.sender_email = config.get("SENDER_EMAIL", config.get("EMAIL_USER"))
+        self.sender_name = config.get("SENDER_NAME", "Cátedra Metodología")
+        self.reply_to = config.get("REPLY_TO", self.sender_email)
+        self.bcc = config.get("TEACHER_BCC")
+        self._sendgrid = None
+        self.smtp = SMTPPool(
+            config.get("SMTP_HOST", "smtp.gmail.com"),
+            config.get("SMTP_PORT", 587),
+            user=config.get("EMAIL_USER"),
+            password=config.get("EMAIL_PASS"),
+            starttls=_as_bool(config.get("SMTP_STARTTLS"), True),
+        )
+
+    def _sendgrid_client(self):
+        if self._sendgrid is None:
+            from sendgrid import SendGridAPIClient
+            self._sendgrid = SendGridAPIClient(self.config["SENDGRID_API_KEY"])
+        return self._sendgrid
+
+    def send_sendgrid(self, destinatario, asunto, mensaje_texto) -> bool:
+        from sendgrid.helpers.mail import Mail, Email, To, Bcc, ReplyTo
+
+        mail = Mail(
+            from_email=Email(self.sender_email, self.sender_name),
+            to_emails=[To(destinatario)],
+            subject=asunto,
+            html_content=html_body(mensaje_texto),
+            plain_text_content=mensaje_texto,
+        )
+        if self.bcc:
+            mail.add_bcc(Bcc(self.bcc))
+        if self.reply_to:
+            mail.reply_to = ReplyTo(self.reply_to)
+        resp = self._sendgrid_client().send(mail)
+        if resp.status_code in (200, 202):
+            return True
+        log.warning("SendGrid devolvió status %s; pruebo SMTP", resp.status_code)
+        return False
+
+    def build_smtp_message(self, destinatario, asunto, mensaje_texto) -> EmailMessage:
+        msg = EmailMessage()
+        msg["From"] = f"{self.sender_name} <{self.sender_email or self.smtp.user}>"
+        msg["To"] = destinatario
+        msg["Subject"] = asunto
+        if self.reply_to:
+            msg["Reply-To"] = self.reply_to
+        if self.bcc:
+            msg["Bcc"] = self.bcc
+        msg.set_content(mensaje_texto)
+        msg.add_alternative(html_body(mensaje_texto), subtype="html")
+        return msg
+
+    def send(self, destinatario, asunto, mensaje_texto):
+        """Entrega el mensaje o lanza la última excepción (para reintentar)."""
+        if self.config.get("SENDGRID_API_KEY"):
+            try:
+                if self.send_sendgrid(destinatario, asunto, mensaje_texto):
+                    return
+            except Exception as e:
+                log.warning("Fallo SendGrid: %s; pruebo SMTP", e)
+        self.smtp.send(self.build_smtp_message(destinatario, asunto, mensaje_texto))
+
+    def close(self):
+        self.smtp.close()
+
+
+# ---------------------------------
+# Cola persistente
+# ---------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    destinatario TEXT NOT NULL,
+    asunto TEXT NOT NULL,
+    cuerpo TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',   -- pendiente | enviado | fallido
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento REAL NOT NULL,
+    ultimo_error TEXT,
+    creado REAL NOT NULL,
+    enviado REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pendientes ON outbox (estado, proximo_intento);
+"""
+
+
+def backoff_delay(intentos: int) -> float:
+    return min(BACKOFF_BASE_S * (2 ** (intentos - 1)), BACKOFF_MAX_S)
+
+
+class Outbox:
+    def __init__(self, db_path, mailer, poll_interval=30.0):
+        self.db_path = str(db_path)
+        self.mailer = mailer
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def enqueue(self, destinatario, asunto, mensaje_texto) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (destinatario, asunto, cuerpo, proximo_intento, creado) VALUES (?, ?, ?, ?, ?)",
+                (destinatario, asunto, mensaje_texto, now, now),
+            )
+        self._wake.set()
+        return cur.lastrowid
+
+    def status(self, msg_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT estado, intentos, ultimo_error FROM outbox WHERE id = ?", (msg_id,)).fetchone()
+        return None if row is None else {"estado": row[0], "intentos": row[1], "ultimo_error": row[2]}
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT estado, COUNT(*) FROM outbox GROUP BY estado").fetchall())
+
+    def _claim_due(self, conn, limit=50):
+        """Reserva mensajes vencidos (seguro aunque haya varios procesos con la misma base)."""
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, destinatario, asunto, cuerpo, intentos FROM outbox "
+            "WHERE estado = 'pendiente' AND proximo_intento <= ? ORDER BY proximo_intento LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            cur = conn.execute(
+                "UPDATE outbox SET proximo_intento = ? WHERE id = ? AND estado = 'pendiente' AND proximo_intento <= ?",
+                (now + CLAIM_LEASE_S, row[0], now),
+            )
+            if cur.rowcount == 1:
+                claimed.append(row)
+        conn.commit()
+        return claimed
+
+    def drain_once(self) -> int:
+        """Intenta entregar los mensajes vencidos; devuelve cuántos se enviaron."""
+        sent = 0
+        with self._connect() as conn:
+            for msg_id, dest, asunto, cuerpo, intentos in self._claim_due(conn):
+                t0 = time.perf_counter()
+                try:
+                    self.mailer.send(dest, asunto, cuerpo)
+                except Exception as e:
+                    EMAIL_DELIVERY_SECONDS.observe(time.perf_counter() - t0, resultado="error")
+                    intentos += 1
+                    estado = "fallido" if intentos >= MAX_ATTEMPTS else "pendiente"
+                    log.warning("Envío a %s falló (intento %d): %s", dest, intentos, e)
+                    conn.execute(
+                        "UPDATE outbox SET estado = ?, intentos = ?, proximo_intento = ?, ultimo_error = ? WHERE id = ?",
+                        (estado, intentos, time.time() + backoff_delay(intentos), str(e), msg_id),
+                    )
+                else:
+                    EMAIL_DELIVERY_SECONDS.observe(time.perf_counter() - t0, resultado="ok")
+                    sent += 1
+                    conn.execute(
+                        "UPDATE outbox SET estado = 'enviado', intentos = ?, enviado = ?, ultimo_error = NULL WHERE id = ?",
+                        (intentos + 1, time.time(), msg_id),
+                    )
+                conn.commit()
+        return sent
+
+    def _next_due_in(self) -> float:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MIN(proximo_intento) FROM outbox WHERE estado = 'pendiente'").fetchone()
+        if row[0] is None:
+            return self.poll_interval
+        return max(0.0, min(self.poll_interval, row[0] - time.time()))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain_once()
+                wait = self._next_due_in()
+            except Exception:
+                log.exception("Error en el hilo de la bandeja de salida")
+                wait = self.poll_interval
+            self._wake.wait(wait)
+            self._wake.clear()
+        self.mailer.close()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    # Vacía la cola una vez con la configuración de .streamlit/secrets.toml.
+    import argparse
+    import tomllib
+
+    ap = argparse.ArgumentParser(description="Bandeja de salida de correos de resultados.")
+    ap.add_argument("--db", help="Bandeja de salida (por defecto OUTBOX_DB de la configuración)")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml")
+    ap.add_argument("--drain", action="store_true", help="Intentar enviar ahora los mensajes pendientes")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    with open(args.secrets, "rb") as fh:
+        config = tomllib.load(fh)
+    outbox = Outbox(args.db or config.get("OUTBOX_DB", "outbox.sqlite3"), Mailer(config))
+    if args.drain:
+        print(f"Enviados: {outbox.drain_once()}")
+        outbox.mailer.close()
+    print(outbox.counts())
@@ -0,0 +1,134 @@
+"""Caché de parseo direccionada por contenido.
+
+La clave es el SHA-256 de los bytes subidos: una re-entrega idéntica no vuelve
+a pasar por pdfminer/python-docx. Hay dos niveles:
+
+- memoria: LRU con desalojo por tamaño aproximado (bytes de texto);
+- disco (opcional): un JSON por documento, sobrevive reinicios de Streamlit.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from documento import ParsedDocument
+
+# Subir este número cuando cambie la salida de read_docx/read_pdf:
+# invalida las entradas guardadas en disco por versiones anteriores.
+PARSER_VERSION = 4
+
+
+def content_hash(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()  # key -> (parsed, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(file_bytes: bytes, suffix: str, digest=None) -> str:
+        return f"{digest or content_hash(file_bytes)}-{suffix.lstrip('.')}-v{PARSER_VERSION}"
+
+    # ---- nivel memoria ----
+    def _get_memory(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _put_memory(self, key, parsed):
+        size = parsed.size()
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (parsed, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    # ---- nivel disco ----
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def _get_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as fh:
+                return ParsedDocument.from_dict(json.load(fh))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _put_disk(self, key, parsed):
+        if not self.disk_dir:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(parsed.to_dict(), fh, ensure_ascii=False)
+            os.replace(tmp, self._disk_path(key))
+        except OSError:
+            pass
+
+    # ---- API ----
+    def get(self, key):
+        with self._lock:
+            parsed = self._get_memory(key)
+            if parsed is not None:
+                self.hits += 1
+                return parsed
+        parsed = self._get_disk(key)
+        with self._lock:
+            if parsed is not None:
+                self.disk_hits += 1
+                self._put_memory(key, parsed)
+            else:
+                self.misses += 1
+        return parsed
+
+    def put(self, key, parsed):
+        with self._lock:
+            self._put_memory(key, parsed)
+        self._put_disk(key, parsed)
+
+    def get_or_parse(self, file_bytes: bytes, suffix: str, reader, digest=None) -> ParsedDocument:
+        """Devuelve el documento parseado desde caché o llamando a `reader(file_bytes)`.
+
+        El documento devuelto se comparte entre llamadas: no debe modificarse. Los
+        documentos truncados (tope de páginas o de tiempo) no se guardan. `digest`
+        evita recalcular el hash si quien llama ya lo tiene (content_hash).
+        """
+        key = self.make_key(file_bytes, suffix, digest)
+        parsed = self.get(key)
+        if parsed is None:
+            parsed = reader(file_bytes)
+            if not parsed.truncated:
+                self.put(key, parsed)
+        return parsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
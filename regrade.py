@@ -0,0 +1,187 @@
+"""Re-corrección con la rúbrica actual, desde los rasgos guardados.
+
+Uso:
+    python regrade.py                                   # informe de cambios, no guarda nada
+    python regrade.py --practico 5 --informe cambios.csv
+    python regrade.py --aplicar                         # guarda las notas nuevas en el historial
+    python regrade.py --aplicar --enviar                # y reenvía el correo a quienes les cambió la nota
+
+Toma la última corrección de cada alumno en cada práctico hecha con otra
+RUBRIC_VERSION y la vuelve a puntuar con los rasgos guardados en
+result_store (tabla `rasgos`), sin leer los archivos: no pasa por pdfminer
+ni por python-docx. Si los rasgos son de otra features_version() (cambiaron
+palabras clave, patrones o lo que se extrae), se recalculan desde el texto
+guardado y se actualizan. Las entregas corregidas antes de que se guardaran
+rasgos figuran como "sin rasgos guardados": hay que volver a subirlas.
+
+El informe tiene una fila por alumno y práctico con el puntaje anterior, el
+nuevo y los criterios que cambiaron. Solo con --enviar se manda correo, y
+solo a quienes les cambió el puntaje.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+from correccion import (RUBRIC_MAX, RUBRIC_VERSION, PRACTICO_LABELS, DocumentFeatures, extract_features,
+                        evaluar_features, detectar_practico, build_feedback_message, features_version)
+from documento import ParsedDocument
+from result_store import ResultStore
+
+REPORT_FIELDS = ["email", "practico", "rubrica_anterior", "puntaje_anterior", "puntaje_nuevo", "diferencia",
+                 "criterios", "error", "envio"]
+
+
+def stored_features(store, digest, cache):
+    """DocumentFeatures del archivo con la versión actual, o None si no hay con qué recalcularlos."""
+    if digest not in cache:
+        f = None
+        guardado = store.load_features(digest) if digest else None
+        if guardado is not None:
+            if guardado["version"] == features_version():
+                f = DocumentFeatures.from_dict(guardado["rasgos"])
+            elif guardado["documento"] is not None:
+                f = extract_features(ParsedDocument.from_dict(guardado["documento"]))
+                store.save_features(digest, features_version(), f.to_dict())
+        cache[digest] = f
+    return cache[digest]
+
+
+def changed_criteria(antes, despues) -> list:
+    """[(criterio, antes, después)] de los criterios cuyo puntaje cambió, aparecieron o desaparecieron."""
+    a = {n: got for n, got, *_ in antes}
+    d = {n: got for n, got, *_ in despues}
+    return [(n, a.get(n), d.get(n)) for n in dict.fromkeys([*a, *d]) if a.get(n) != d.get(n)]
+
+
+def regrade(store, practico=None, todas=False) -> list:
+    """Vuelve a puntuar la última corrección de cada alumno y práctico; no guarda nada.
+
+    Con `todas=True` incluye también las ya corregidas con la RUBRIC_VERSION actual.
+    """
+    cache, items = {}, []
+    for fila in store.latest_per_student(practico):
+        if fila["rubric_version"] == RUBRIC_VERSION and not todas:
+            continue
+        item = {"anterior": fila, "error": "", "envio": ""}
+        f = stored_features(store, fila["hash"], cache)
+        if f is None:
+            item["error"] = "sin rasgos guardados"
+        else:
+            score, breakdown, summary = evaluar_features(fila["practico"], f)
+            sugerido, puntajes = detectar_practico(f, fila["practico"])
+            item.update(puntaje=score, desglose=breakdown, resumen=summary, sugerido=sugerido, puntajes=puntajes,
+                        criterios=changed_criteria(fila["desglose"], breakdown))
+        items.append(item)
+    return items
+
+
+def apply(store, items):
+    """Guarda cada nota recalculada como una corrección nueva (origen `recorreccion`)."""
+    for item in items:
+        if item["error"]:
+            continue
+        fila = item["anterior"]
+        item["resultado"] = store.record(
+            fila["hash"], fila["email"], fila["practico"], item["puntaje"], RUBRIC_MAX[fila["practico"]],
+            item["desglose"], item["resumen"], fila["aviso"], item["sugerido"], item["puntajes"], None,
+            fila["filetype"], fila["file_bytes"], fila["pages"], "recorreccion")
+
+
+def send_changes(items, config):
+    """Encola en la bandeja de salida el resultado nuevo de quienes cambiaron de puntaje."""
+    from outbox import Outbox, Mailer
+
+    outbox = Outbox(config.get("OUTBOX_DB", "outbox.sqlite3"), Mailer(config))
+    for item in items:
+        fila = item["anterior"]
+        if item["error"] or item["puntaje"] == fila["puntaje"]:
+            continue
+        num = fila["practico"]
+        aviso = f"Se actualizó la rúbrica de corrección; el puntaje anterior era {fila['puntaje']}/{fila['maximo']}."
+        if fila["aviso"]:
+            aviso += " " + fila["aviso"]
+        mensaje = build_feedback_message(num, item["puntaje"], item["desglose"], item["resumen"], aviso)
+        outbox.enqueue(fila["email"], f"Resultado actualizado — {PRACTICO_LABELS[num]}", mensaje)
+        item["envio"] = "encolado"
+    # Lo que no salga ahora queda pendiente y lo reintenta la app (o `python outbox.py --drain`).
+    return outbox.drain_once()
+
+
+def report_rows(items) -> list:
+    rows = []
+    for item in items:
+        fila = item["anterior"]
+        nuevo = item.get("puntaje")
+        rows.append({
+            "email": fila["email"], "practico": fila["practico"], "rubrica_anterior": fila["rubric_version"],
+            "puntaje_anterior": fila["puntaje"], "puntaje_nuevo": "" if nuevo is None else nuevo,
+            "diferencia": "" if nuevo is None else nuevo - fila["puntaje"],
+            "criterios": "; ".join(f"{n}: {'—' if a is None else a} → {'—' if d is None else d}"
+                                   for n, a, d in item.get("criterios", ())),
+            "error": item["error"], "envio": item["envio"],
+        })
+    return rows
+
+
+def write_report(rows, out_path):
+    out_path = Path(out_path)
+    if out_path.suffix.lower() == ".json":
+        out_path.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+        return
+    with open(out_path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-corrección con la rúbrica actual, sin volver a parsear.")
+    ap.add_argument("--practico", type=int, choices=sorted(RUBRIC_MAX), help="Solo este práctico")
+    ap.add_argument("--todas", action="store_true", help="Incluir también las corregidas con la rúbrica actual")
+    ap.add_argument("--informe", help="Guardar el informe de cambios (.csv o .json)")
+    ap.add_argument("--aplicar", action="store_true", help="Guardar las notas nuevas en el historial")
+    ap.add_argument("--enviar", action="store_true", help="Reenviar el correo a quienes les cambió el puntaje")
+    ap.add_argument("--db", help="Historial de correcciones (por defecto RESULTS_DB de la configuración)")
+    ap.add_argument("--secrets", default=".streamlit/secrets.toml", help="Configuración (TOML): RESULTS_DB, correo")
+    args = ap.parse_args(argv)
+    if args.enviar and not args.aplicar:
+        ap.error("--enviar requiere --aplicar: el correo tiene que coincidir con la nota guardada")
+
+    config = {}
+    if Path(args.secrets).exists():
+        import tomllib
+        with open(args.secrets, "rb") as fh:
+            config = tomllib.load(fh)
+    store = ResultStore(args.db or config.get("RESULTS_DB", "resultados.sqlite3"))
+
+    t0 = time.perf_counter()
+    items = regrade(store, args.practico, args.todas)
+    if args.aplicar:
+        apply(store, items)
+    if args.enviar:
+        enviados = send_changes(items, config)
+        encolados = sum(1 for item in items if item["envio"])
+        print(f"Correos: {encolados} encolados, {enviados} enviados ahora", file=sys.stderr)
+
+    rows = report_rows(items)
+    for row in rows:
+        if row["error"]:
+            print(f"{row['email']}  P{row['practico']}  {row['error']}")
+        elif row["diferencia"]:
+            print(f"{row['email']}  P{row['practico']}  {row['puntaje_anterior']} → {row['puntaje_nuevo']} "
+                  f"({row['diferencia']:+d})  {row['criterios']}")
+    if args.informe:
+        write_report(rows, args.informe)
+    cambios = sum(1 for row in rows if row["diferencia"])
+    sin_rasgos = sum(1 for row in rows if row["error"])
+    print(f"{len(rows)} correcciones revisadas en {time.perf_counter() - t0:.1f}s: {cambios} con cambio de puntaje, "
+          f"{sin_rasgos} sin rasgos guardados" + (" — guardadas en el historial" if args.aplicar else ""),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Historial de correcciones en SQLite.
+
+Cada corrección queda registrada con el hash del archivo, el alumno, el
+práctico, el puntaje, el desglose, la versión de la rúbrica y los tiempos por
+etapa. Una re-entrega idéntica (mismo hash, práctico y versión de rúbrica) se
+responde desde aquí sin volver a parsear ni evaluar. Los índices por alumno y
+por práctico mantienen ágil la vista docente con decenas de miles de filas.
+
+Aparte se guardan, por hash, los rasgos que miran las rúbricas
+(DocumentFeatures) y el texto extraído comprimido: al cambiar una rúbrica,
+regrade.py vuelve a puntuar desde ahí sin leer de nuevo los archivos.
+"""
+import json
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+from correccion import RUBRIC_VERSION
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL,
+    email TEXT NOT NULL,
+    practico INTEGER NOT NULL,
+    rubric_version INTEGER NOT NULL,
+    puntaje INTEGER NOT NULL,
+    maximo INTEGER NOT NULL,
+    desglose TEXT NOT NULL,          -- JSON [[criterio, puntaje, maximo, explicacion], ...]
+    resumen TEXT NOT NULL,
+    aviso TEXT NOT NULL DEFAULT '',  -- no vacío: documento truncado, no se reutiliza
+    sugerido INTEGER,
+    puntajes TEXT,                   -- JSON {practico: puntaje 0-100} de detectar_practico
+    tiempos TEXT,                    -- JSON {etapa: ms}
+    filetype TEXT,
+    file_bytes INTEGER,
+    pages INTEGER,
+    origen TEXT NOT NULL,            -- app | api | recorreccion
+    reutilizado INTEGER NOT NULL DEFAULT 0,
+    creado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resultados_dedup ON resultados (hash, practico, rubric_version, creado);
+CREATE INDEX IF NOT EXISTS resultados_email ON resultados (email, creado);
+CREATE INDEX IF NOT EXISTS resultados_practico ON resultados (practico, creado);
+CREATE INDEX IF NOT EXISTS resultados_creado ON resultados (creado);
+-- Cubre summary() sin leer la tabla.
+CREATE INDEX IF NOT EXISTS resultados_resumen ON resultados (practico, email, puntaje);
+-- Última corrección de cada alumno y práctico (regrade.py).
+CREATE INDEX IF NOT EXISTS resultados_ultimo ON resultados (email, practico, creado);
+CREATE TABLE IF NOT EXISTS rasgos (
+    hash TEXT PRIMARY KEY,
+    version TEXT NOT NULL,           -- correccion.features_version() al extraerlos
+    rasgos TEXT NOT NULL,            -- JSON de DocumentFeatures.to_dict()
+    documento BLOB,                  -- ParsedDocument.to_dict() en JSON, comprimido (pack_document)
+    creado REAL NOT NULL
+);
+"""
+
+# Columnas livianas para los listados (sin desglose ni resumen).
+LIST_COLUMNS = "id, creado, email, practico, puntaje, maximo, filetype, pages, origen, reutilizado"
+
+
+def pack_document(doc) -> bytes:
+    """Texto extraído de un ParsedDocument, para recalcular los rasgos sin volver a parsear."""
+    return zlib.compress(json.dumps(doc.to_dict(), ensure_ascii=False).encode("utf-8"), 6)
+
+
+def unpack_document(blob) -> dict:
+    return json.loads(zlib.decompress(blob))
+
+
+class ResultStore:
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row(row) -> dict:
+        d = dict(row)
+        if "desglose" in d:
+            d["desglose"] = [tuple(x) for x in json.loads(d["desglose"])]
+        if d.get("puntajes"):
+            d["puntajes"] = {int(k): v for k, v in json.loads(d["puntajes"]).items()}
+        if d.get("tiempos"):
+            d["tiempos"] = json.loads(d["tiempos"])
+        return d
+
+    def lookup(self, digest, practico, rubric_version=RUBRIC_VERSION):
+        """Última corrección completa del mismo archivo para el mismo práctico y rúbrica."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM resultados WHERE hash = ? AND practico = ? AND rubric_version = ? AND aviso = '' "
+                "ORDER BY creado DESC LIMIT 1",
+                (digest, practico, rubric_version),
+            ).fetchone()
+        return None if row is None else self._row(row)
+
+    def record(self, digest, email, practico, puntaje, maximo, breakdown, resumen, aviso="",
+               sugerido=None, puntajes=None, tiempos=None, filetype=None, file_bytes=None, pages=None,
+               origen="app", reutilizado=False, rubric_version=RUBRIC_VERSION) -> int:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO resultados (hash, email, practico, rubric_version, puntaje, maximo, desglose, resumen, "
+                "aviso, sugerido, puntajes, tiempos, filetype, file_bytes, pages, origen, reutilizado, creado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (digest, email.strip().lower(), practico, rubric_version, puntaje, maximo,
+                 json.dumps([list(b) for b in breakdown], ensure_ascii=False), resumen, aviso or "",
+                 sugerido, json.dumps(puntajes) if puntajes else None,
+                 json.dumps({k: round(v * 1000, 2) for k, v in tiempos.items()}) if tiempos else None,
+                 filetype, file_bytes, pages, origen, int(bool(reutilizado)), time.time()),
+            )
+        return cur.lastrowid
+
+    def get(self, result_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM resultados WHERE id = ?", (result_id,)).fetchone()
+        return None if row is None else self._row(row)
+
+    # ---- rasgos por archivo (re-corrección sin parsear) ----
+    def save_features(self, digest, version, rasgos: dict, documento: bytes = None):
+        """Guarda (o reemplaza) los rasgos de un archivo; sin `documento` conserva el texto ya guardado."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO rasgos (hash, version, rasgos, documento, creado) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET version = excluded.version, rasgos = excluded.rasgos, "
+                "documento = COALESCE(excluded.documento, rasgos.documento), creado = excluded.creado",
+                (digest, version, json.dumps(rasgos, ensure_ascii=False), documento, time.time()),
+            )
+
+    def load_features(self, digest):
+        """{version, rasgos, documento} del archivo, o None; `documento` es el dict de ParsedDocument o None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT version, rasgos, documento FROM rasgos WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        return {"version": row["version"], "rasgos": json.loads(row["rasgos"]),
+                "documento": unpack_document(row["documento"]) if row["documento"] else None}
+
+    def latest_per_student(self, practico=None) -> list:
+        """Última corrección completa (con desglose) de cada alumno en cada práctico."""
+        where, params = ("WHERE practico = ?", (practico,)) if practico is not None else ("", ())
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT r.* FROM resultados r JOIN (SELECT email, practico, MAX(creado) AS creado FROM resultados "
+                f"{where} GROUP BY email, practico) u USING (email, practico, creado) ORDER BY r.practico, r.email",
+                params,
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    # ---- consultas de la vista docente ----
+    def by_student(self, email, practico=None, limit=100, before=None) -> list:
+        if practico is not None:
+            # Filtro en SQL, antes del LIMIT (índice resultados_ultimo).
+            return self._list("email = ? AND practico = ?", (email.strip().lower(), practico), limit, before)
+        return self._list("email = ?", (email.strip().lower(),), limit, before)
+
+    def by_practico(self, practico, limit=100, before=None) -> list:
+        return self._list("practico = ?", (practico,), limit, before)
+
+    def recent(self, limit=100, before=None) -> list:
+        return self._list("1", (), limit, before)
+
+    def _list(self, where, params, limit, before):
+        """Paginado por `creado` (keyset): cada página cuesta lo mismo aunque la tabla crezca."""
+        if before is not None:
+            where, params = f"{where} AND creado < ?", params + (before,)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {LIST_COLUMNS} FROM resultados WHERE {where} ORDER BY creado DESC LIMIT ?",
+                params + (limit,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def summary(self) -> list:
+        """Entregas, alumnos distintos y promedio por práctico."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT practico, COUNT(*) AS entregas, COUNT(DISTINCT email) AS alumnos, "
+                "ROUND(AVG(puntaje), 1) AS promedio FROM resultados GROUP BY practico ORDER BY practico"
+            ).fetchall()
+        return [dict(r) for r in rows]
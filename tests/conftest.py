@@ -0,0 +1,52 @@
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio (sin paquete).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class _Recolector:
+    """Handler de aiosmtpd que guarda los mensajes recibidos."""
+
+    def __init__(self):
+        self.mensajes = []
+        self.rechazar = set()
+        self.conexiones = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.conexiones += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rechazar:
+            return "550 buzón inexistente"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensajes.append((envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    """Servidor SMTP local (aiosmtpd) en un puerto libre."""
+    controller_mod = pytest.importorskip("aiosmtpd.controller")
+    handler = _Recolector()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        handler.port = s.getsockname()[1]
+    controller = controller_mod.Controller(handler, hostname="127.0.0.1", port=handler.port)
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def mail_config(smtp_server):
+    return {"SMTP_HOST": "127.0.0.1", "SMTP_PORT": smtp_server.port, "SMTP_STARTTLS": False,
+            "SENDER_EMAIL": "catedra@example.edu"}
@@ -0,0 +1,58 @@
+import json
+import urllib.error
+
+from bulk_mail import SENDGRID_MAX_RECIPIENTS, RecordingTransport, bulk_send
+from outbox import Mailer
+
+
+def _items(n):
+    return [(f"alumno{i}@example.edu", f"Resultado {i}", f"Puntaje {i}") for i in range(n)]
+
+
+def _recipients(body):
+    return sum(len(p["to"]) + len(p.get("bcc", [])) for p in body["personalizations"])
+
+
+def test_lotes_respetan_el_tope_de_destinatarios_sin_copia(mail_config):
+    transport = RecordingTransport()
+    statuses = bulk_send(Mailer(mail_config), _items(2500), transport=transport)
+    assert [len(r["personalizations"]) for r in transport.requests] == [1000, 1000, 500]
+    assert all(s["via"] == "sendgrid" for s in statuses)
+
+
+def test_lotes_con_copia_al_docente_cuentan_el_bcc(mail_config):
+    mailer = Mailer({**mail_config, "TEACHER_BCC": "docente@example.edu"})
+    transport = RecordingTransport()
+    statuses = bulk_send(mailer, _items(1200), transport=transport)
+    assert [len(r["personalizations"]) for r in transport.requests] == [500, 500, 200]
+    assert max(_recipients(r) for r in transport.requests) <= SENDGRID_MAX_RECIPIENTS
+    assert all(s["via"] == "sendgrid" for s in statuses)
+
+
+def test_rechazo_por_indice_reintenta_el_resto_y_deriva_a_smtp(mail_config, smtp_server):
+    error = json.dumps({"errors": [{"field": "personalizations.1.to", "message": "Invalid email"}]})
+    transport = RecordingTransport([(400, error), (202, "")])
+    statuses = bulk_send(Mailer(mail_config), _items(3), transport=transport)
+    # Segundo pedido sin el destinatario objetado.
+    assert [p["to"][0]["email"] for p in transport.requests[1]["personalizations"]] == \
+        ["alumno0@example.edu", "alumno2@example.edu"]
+    assert [s["via"] for s in statuses] == ["sendgrid", "smtp", "sendgrid"]
+    assert [rcpt for rcpt, _ in smtp_server.mensajes] == [["alumno1@example.edu"]]
+
+
+def test_error_de_red_deriva_el_bloque_entero_a_smtp(mail_config, smtp_server):
+    class Caido:
+        def send(self, body):
+            raise urllib.error.URLError("connection reset")
+
+    statuses = bulk_send(Mailer(mail_config), _items(3), transport=Caido(), batch_size=2)
+    assert [s["via"] for s in statuses] == ["smtp"] * 3
+    assert len(smtp_server.mensajes) == 3
+
+
+def test_fallo_de_smtp_queda_registrado(mail_config, smtp_server):
+    smtp_server.rechazar.add("alumno0@example.edu")
+    statuses = bulk_send(Mailer(mail_config), _items(2), transport=RecordingTransport([(500, "")]))
+    assert statuses[0]["via"] is None
+    assert statuses[0]["error"].startswith("SendGrid 500; SMTP:")
+    assert statuses[1]["via"] == "smtp"
@@ -0,0 +1,54 @@
+import pytest
+
+from citation_scanner import scan
+
+
+@pytest.mark.parametrize("parrafo, esperadas", [
+    ("García et al. (2018) sostienen que la salud es un derecho (Martínez-Ruiz et al., 2017, p. 12).",
+     [("García et al.", "2018"), ("Martínez-Ruiz et al.", "2017")]),
+    ("El tema es relevante según García et al. (2018) y otros autores.", [("García et al.", "2018")]),
+    ("Pérez (2020) sostiene que el muestreo importa.", [("Pérez", "2020")]),
+    ("Hernández y Sampieri (2014) proponen un enfoque mixto.", [("Hernández y Sampieri", "2014")]),
+    ("Como se señaló (García & Pérez, 2020; López et al., 2018a).",
+     [("García & Pérez", "2020"), ("López et al.", "2018a")]),
+    ("Según la bibliografía (OMS, s.f.).", [("OMS", "s.f.")]),
+])
+def test_citas_narrativas_y_parenteticas_en_el_cuerpo(parrafo, esperadas):
+    r = scan([parrafo])
+    assert r.citas == esperadas
+    assert r.referencias == []
+
+
+def test_cita_narrativa_antes_de_la_lista_no_es_referencia():
+    r = scan(["García et al. (2018). Esto no es una entrada: está antes del título.",
+              "Referencias",
+              "García, J., Pérez, A., & López, M. (2018). Título del artículo. Revista, 3(1), 1-10. "
+              "https://doi.org/10.1000/xyz"])
+    assert r.citas == [("García et al.", "2018")]
+    assert [ref[:2] for ref in r.referencias] == [("García, J., Pérez, A., & López, M", "2018")]
+    assert r.sin_referencia == [] and r.no_citadas == []
+    assert r.completas() == 1
+
+
+def test_referencias_sin_titulo_de_seccion():
+    r = scan(["Introducción (García, 2019).", "García, J. (2019). Título del libro. Editorial."])
+    assert r.citas == [("García", "2019")]
+    assert r.referencias == [("García, J", "2019", True, "", "")]
+    assert not r.seccion
+
+
+def test_cruce_de_citas_y_referencias():
+    r = scan(["Intro (OMS, 2019) y Pérez (2020).", "Bibliografía",
+              "OMS. (2019). Informe mundial de salud. Ginebra.", "López, M. (2015). Otro título. Editorial."])
+    assert r.sin_referencia == ["Pérez, 2020"]
+    assert r.no_citadas == ["López, M, 2015"]
+
+
+def test_referencia_con_particula_en_minuscula():
+    r = scan(["Como señala de la Fuente (1984), el tema es central.", "Referencias",
+              "de la Fuente, M. (1984). Métodos de investigación social. Revista, 12(3), 45-60.",
+              "van Dijk, T., & López, A. (2001). Otro título. Editorial."])
+    assert r.citas == [("de la Fuente", "1984")]
+    assert [ref[:2] for ref in r.referencias] == [("de la Fuente, M", "1984"), ("van Dijk, T., & López, A", "2001")]
+    assert r.sin_referencia == []
+    assert r.no_citadas == ["van Dijk, T., & López, A, 2001"]
@@ -0,0 +1,26 @@
+import json
+
+import metrics
+
+
+def test_configure_log_escribe_una_linea_json_por_correccion(tmp_path):
+    destino = tmp_path / "metrics.log"
+    log = metrics.configure_log(destino)
+    try:
+        metrics.configure_log(destino)
+        assert sum(1 for h in log.handlers if getattr(h, "_metrics", False)) == 1
+        trace = metrics.GradingTrace()
+        with trace.stage("parse_file"):
+            pass
+        trace.file_bytes = 1234
+        trace.finish(filetype="pdf", pages=3, practico=4)
+        for h in log.handlers:
+            h.flush()
+        lineas = destino.read_text(encoding="utf-8").splitlines()
+        assert len(lineas) == 1
+        registro = json.loads(lineas[0])
+        assert registro["filetype"] == "pdf" and registro["practico"] == 4
+    finally:
+        for h in list(log.handlers):
+            log.removeHandler(h)
+            h.close()
@@ -0,0 +1,85 @@
+import sqlite3
+import time
+
+import pytest
+
+import outbox
+from outbox import CLAIM_LEASE_S, MAX_ATTEMPTS, Mailer, Outbox, backoff_delay
+
+
+@pytest.fixture
+def bandeja(tmp_path, mail_config):
+    box = Outbox(tmp_path / "outbox.sqlite3", Mailer(mail_config))
+    yield box
+    box.mailer.close()
+
+
+def _vencer(box, msg_id):
+    """Adelanta el próximo intento para no esperar el backoff."""
+    with sqlite3.connect(box.db_path) as conn:
+        conn.execute("UPDATE outbox SET proximo_intento = ? WHERE id = ?", (time.time() - 1, msg_id))
+
+
+def _proximo_intento(box, msg_id):
+    with sqlite3.connect(box.db_path) as conn:
+        return conn.execute("SELECT proximo_intento FROM outbox WHERE id = ?", (msg_id,)).fetchone()[0]
+
+
+def test_encolar_y_vaciar_entrega_por_smtp_con_una_conexion(bandeja, smtp_server):
+    ids = [bandeja.enqueue(f"alumno{i}@example.edu", "Resultado", f"Puntaje {i}") for i in range(3)]
+    assert bandeja.counts() == {"pendiente": 3}
+    assert bandeja.drain_once() == 3
+    assert [rcpt for rcpt, _ in smtp_server.mensajes] == [[f"alumno{i}@example.edu"] for i in range(3)]
+    assert smtp_server.conexiones == 1
+    assert all(bandeja.status(i) == {"estado": "enviado", "intentos": 1, "ultimo_error": None} for i in ids)
+    assert bandeja.drain_once() == 0
+
+
+def test_fallo_se_reintenta_con_backoff(bandeja, smtp_server):
+    smtp_server.rechazar.add("alumno@example.edu")
+    msg_id = bandeja.enqueue("alumno@example.edu", "Resultado", "Puntaje")
+    t0 = time.time()
+    assert bandeja.drain_once() == 0
+    estado = bandeja.status(msg_id)
+    assert estado["estado"] == "pendiente" and estado["intentos"] == 1
+    assert "550" in estado["ultimo_error"]
+    assert _proximo_intento(bandeja, msg_id) >= t0 + backoff_delay(1)
+    # Antes de que venza el backoff no se vuelve a intentar.
+    assert bandeja.drain_once() == 0
+    assert bandeja.status(msg_id)["intentos"] == 1
+
+    smtp_server.rechazar.clear()
+    _vencer(bandeja, msg_id)
+    assert bandeja.drain_once() == 1
+    assert bandeja.status(msg_id) == {"estado": "enviado", "intentos": 2, "ultimo_error": None}
+
+
+def test_queda_fallido_tras_el_maximo_de_intentos(bandeja, smtp_server):
+    smtp_server.rechazar.add("alumno@example.edu")
+    msg_id = bandeja.enqueue("alumno@example.edu", "Resultado", "Puntaje")
+    for _ in range(MAX_ATTEMPTS):
+        _vencer(bandeja, msg_id)
+        bandeja.drain_once()
+    assert bandeja.status(msg_id)["estado"] == "fallido"
+    assert bandeja.status(msg_id)["intentos"] == MAX_ATTEMPTS
+    _vencer(bandeja, msg_id)
+    assert bandeja.drain_once() == 0
+    assert bandeja.status(msg_id)["intentos"] == MAX_ATTEMPTS
+
+
+def test_backoff_exponencial_con_tope():
+    assert [backoff_delay(i) for i in (1, 2, 3)] == [outbox.BACKOFF_BASE_S * k for k in (1, 2, 4)]
+    assert backoff_delay(50) == outbox.BACKOFF_MAX_S
+
+
+def test_la_reserva_evita_que_otro_proceso_tome_el_mismo_mensaje(bandeja, monkeypatch):
+    msg_id = bandeja.enqueue("alumno@example.edu", "Resultado", "Puntaje")
+    otra = Outbox(bandeja.db_path, bandeja.mailer)
+    with bandeja._connect() as a, otra._connect() as b:
+        assert [row[0] for row in bandeja._claim_due(a)] == [msg_id]
+        assert otra._claim_due(b) == []
+    # Si el que lo reservó muere sin actualizarlo, la reserva vence y otro lo toma.
+    ahora = time.time()
+    monkeypatch.setattr(outbox.time, "time", lambda: ahora + CLAIM_LEASE_S + 1)
+    with otra._connect() as b:
+        assert [row[0] for row in otra._claim_due(b)] == [msg_id]
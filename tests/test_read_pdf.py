@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+import correccion
+from generador import generar
+
+
+@pytest.fixture(scope="module")
+def pdf_largo():
+    pytest.importorskip("pdfminer")
+    return generar(4, 50, "pdf")
+
+
+def test_lectura_en_paralelo_reutiliza_el_pool_y_coincide_con_la_serie(pdf_largo, monkeypatch):
+    monkeypatch.setattr(correccion.os, "cpu_count", lambda: 4)
+    serie = correccion.read_pdf(pdf_largo, workers=1)
+    assert serie.pages >= correccion.PDF_PARALLEL_MIN_PAGES
+    primero = correccion.read_pdf(pdf_largo, workers=4)
+    pool = correccion._pdf_pool()
+    segundo = correccion.read_pdf(pdf_largo, workers=4)
+    assert correccion._pdf_pool() is pool
+    assert pool._mp_context.get_start_method() == "spawn"
+    assert primero.text == segundo.text == serie.text
+    assert not primero.truncated